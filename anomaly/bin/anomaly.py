@@ -1,25 +1,24 @@
 #!/usr/bin/env python3
 import argparse
-import pickle
-import psutil
-import pandas as pd
+import os
+import sys
 import time
+from functools import partial
 
-import warnings
+import numpy as np
 
-# Silence sklearn unpickle & feature‐name warnings
-warnings.filterwarnings("ignore",
-    message="Trying to unpickle estimator.*version.*",
-    category=UserWarning)
-warnings.filterwarnings("ignore",
-    message="X does not have valid feature names.*",
-    category=UserWarning)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.cgroups import CgroupSampler
+from common.forest import FlatIsolationForest
+from common.metrics import TOP_N, publish
+from common.models import ModelHandle
+from common.sampler import Sampler
+from events import DB_PATH, EventStore
+from trends import ProcessHistory, trend_decision, window_metrics
+from online import OnlineDetector
 
-# Load your saved anomaly detector and scaler
-with open("anomaly/bin/anomaly-detector.pkl", "rb") as f:
-    state = pickle.load(f)
-iso_forest = state["model"]
-scaler     = state["scaler"]
+# IsolationForest (scaler folded in) from the model registry, loaded on first use
+detector = ModelHandle("anomaly", FlatIsolationForest.from_bundle)
 
 # Features your model expects
 perf_metrics = [
@@ -30,62 +29,169 @@ perf_metrics = [
     'Network transmitted throughput [KB/s]'
 ]
 
-def get_process_metrics():
-    """Collect per-process metrics with a 1s I/O snapshot."""
-    baseline, info = {}, {}
-    for proc in psutil.process_iter(['pid', 'name']):
-        try:
-            pid = proc.pid
-            info[pid] = {
-                'name': proc.info['name'],
-                'CPU usage [%]': proc.cpu_percent(interval=None),
-                'Memory usage [KB]': proc.memory_info().rss / 1024.0
-            }
-            io = proc.io_counters() if hasattr(proc, 'io_counters') else None
-            net = proc.net_io_counters() if hasattr(proc, 'net_io_counters') else None
-            baseline[pid] = {
-                'disk_write': io.write_bytes if io else 0,
-                'net_recv':   net.bytes_recv  if net else 0,
-                'net_sent':   net.bytes_sent  if net else 0
-            }
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-
-    time.sleep(1.0)
-
-    for proc in psutil.process_iter(['pid']):
-        pid = proc.pid
-        if pid not in info:
-            continue
-        try:
-            io = proc.io_counters() if hasattr(proc, 'io_counters') else None
-            net = proc.net_io_counters() if hasattr(proc, 'net_io_counters') else None
-            curr = {
-                'disk_write': io.write_bytes if io else 0,
-                'net_recv':   net.bytes_recv  if net else 0,
-                'net_sent':   net.bytes_sent  if net else 0
-            }
-            base = baseline.get(pid, {'disk_write':0,'net_recv':0,'net_sent':0})
-            info[pid].update({
-                'Disk write throughput [KB/s]':      (curr['disk_write'] - base['disk_write']) / 1024.0,
-                'Network received throughput [KB/s]': (curr['net_recv']   - base['net_recv'])   / 1024.0,
-                'Network transmitted throughput [KB/s]': (curr['net_sent'] - base['net_sent']) / 1024.0
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            info.pop(pid, None)
-
-    df = pd.DataFrame.from_dict(info, orient='index')
+# The online detector also learns from these windowed features when histories are kept
+online_metrics = perf_metrics + [
+    'Memory slope [KB/s]',
+    'CPU mean [%]',
+    'CPU variance',
+    'I/O burstiness'
+]
+
+def get_process_metrics(sampler=None, window=1.0):
+    """Per-process metrics from CPU and I/O deltas since the sampler's last tick.
+
+    Only a fresh sampler is primed and given `window` seconds; a persistent
+    one (continuous mode) is read without sleeping.
+    """
+    sampler = sampler or Sampler()
+    if sampler.last is None:
+        sampler.sample()
+        time.sleep(window)
+    return process_features(sampler.sample())
+
+def get_cgroup_metrics(sampler=None, window=1.0):
+    """Per-cgroup metrics from cgroup v2 counters, like get_process_metrics."""
+    sampler = sampler or CgroupSampler()
+    if sampler.last is None:
+        sampler.sample()
+        time.sleep(window)
+    return cgroup_features(sampler.sample())
+
+def cgroup_features(snap):
+    """Model features of every cgroup that was also in the previous snapshot.
+
+    Rows are indexed by cgroup path; the directory inode stands in for a
+    process's create_time so a recreated cgroup gets a fresh baseline (it
+    is not a time: trends.ProcessHistory gives cgroups no age). The values
+    are totals over every process in the group, while the IsolationForest
+    was trained on single processes, so with the forest a group scores as
+    anomalous for being large as much as for behaving oddly. The online
+    detector learns each group's own baseline and has no such bias.
+    """
+    df = snap.to_frame()
+    df = df[~df['is_new']]
+    df = df.assign(**{
+        'create_time': df['inode'].astype(float),
+        'CPU usage [%]': df['cpu_percent'],
+        'Memory usage [KB]': df['memory'] / 1024.0,
+        'Disk write throughput [KB/s]': df['write_rate'] / 1024.0,
+        # cgroup v2 has no network accounting
+        'Network received throughput [KB/s]': 0.0,
+        'Network transmitted throughput [KB/s]': 0.0,
+    })[['name', 'create_time', *perf_metrics]]
     return df.dropna(subset=perf_metrics)
 
-def detect(df):
-    """Annotate df with anomaly flag & score."""
-    X = scaler.transform(df[perf_metrics].values)
-    labels = iso_forest.predict(X)          # -1 anomaly, 1 normal
-    scores = iso_forest.decision_function(X)
+def process_features(snap):
+    """Model features of every process that was also in the previous snapshot."""
+    df = snap.to_frame()
+    df = df[~df['is_new']]
+    df = df.assign(**{
+        'CPU usage [%]': df['cpu_percent'],
+        'Memory usage [KB]': df['rss'] / 1024.0,
+        'Disk write throughput [KB/s]': df['write_rate'] / 1024.0,
+        # per-process network counters are not exposed by the kernel
+        'Network received throughput [KB/s]': 0.0,
+        'Network transmitted throughput [KB/s]': 0.0,
+    })[['name', 'create_time', *perf_metrics]]
+    return df.dropna(subset=perf_metrics)
+
+def detect(df, online=None, trend=None):
+    """Annotate df with anomaly flag & score, from the IsolationForest or an OnlineDetector.
+
+    `trend` (trends.trend_decision) can only lower a score, flagging leaks
+    and runaways that look normal in a single snapshot.
+    """
+    if online is not None:
+        X = df[[c for c in online_metrics if c in df]].to_numpy(dtype=float)
+        labels, scores = online.score(X, list(zip(df.index.tolist(), df['create_time'].tolist())))
+    else:
+        X = df[perf_metrics].to_numpy(dtype=float)
+        labels, scores = detector.get().score(X)    # -1 anomaly, 1 normal
+    if trend is not None:
+        scores = np.minimum(scores, trend)
+        labels = np.where(scores < 0, -1, labels)
     df['is_anomaly']    = (labels == -1)
     df['anomaly_score'] = scores
     return df
 
+def publish_scores(df, online=None):
+    """Share the most anomalous processes with the dashboard's /metrics."""
+    worst = df.nsmallest(TOP_N, 'anomaly_score')
+    cgroups = df.index.name == "cgroup"
+    publish("anomaly", {
+        "timestamp": time.time(),
+        "scored": len(df),
+        "anomalous": int(df['is_anomaly'].sum()),
+        "processes": [
+            {("cgroup" if cgroups else "pid"): key if cgroups else int(key), "name": row['name'],
+             "score": float(row['anomaly_score']), "anomaly": bool(row['is_anomaly'])}
+            for key, row in worst.iterrows()
+        ],
+        "detector": "online" if online is not None else "forest",
+        "model": detector.info() if online is None else None,
+        "online": online.info() if online is not None else None
+    })
+
+def run_continuous(interval, top, online=None, events=None, history=None, trend=trend_decision, cgroups=None):
+    """Score every `interval` seconds from consecutive samples, with no sleep inside a tick.
+
+    Processes are scored unless a CgroupSampler is given as `cgroups`.
+
+    With a ProcessHistory, windowed features are added to every tick and
+    `trend` of them folded into the scores. With an EventStore, only
+    incidents opening and closing are printed.
+    """
+    sampler = cgroups or Sampler()
+    collect = get_cgroup_metrics if cgroups is not None else get_process_metrics
+    print(f"Monitoring {'cgroups' if cgroups is not None else 'processes'} for anomalies every {interval}s. "
+          "Ctrl-C to stop.")
+    # the first sample only primes the counters; the next tick has a full interval of deltas
+    sampler.sample()
+    next_tick = time.monotonic() + interval
+    try:
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            df = collect(sampler)
+            scores = None
+            if history is not None:
+                window = history.update(df)
+                df = df.assign(**{name: window[name] for name in window_metrics})
+                scores = trend(window)
+            df = detect(df, online, scores)
+            publish_scores(df, online)
+            if events is not None:
+                report_incidents(*events.observe(df), top)
+            elif df['is_anomaly'].any():
+                anoms = df[df['is_anomaly']]
+                # sort by score ascending (most anomalous first)
+                anoms = anoms.nsmallest(top, 'anomaly_score')
+                print(f"\n[{time.strftime('%H:%M:%S')}] Detected {len(anoms)} anomalous process(es):")
+                print(anoms[['name','anomaly_score']])
+            next_tick += interval
+            if next_tick < time.monotonic():
+                # a tick overran the interval; skip the missed ones rather than bursting to catch up
+                next_tick = time.monotonic() + interval
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        if events is not None:
+            events.close()
+
+def describe(incident):
+    """Process name and pid, or cgroup name and path."""
+    key = incident['key']
+    return f"{incident['name']} ({'' if key.startswith('/') else 'pid '}{key})"
+
+def report_incidents(opened, closed, top):
+    stamp = time.strftime('%H:%M:%S')
+    for incident in sorted(opened, key=lambda i: i['peak_score'])[:top]:
+        print(f"[{stamp}] anomaly opened: {describe(incident)}, score {incident['peak_score']:.3f}")
+    if len(opened) > top:
+        print(f"[{stamp}] ... and {len(opened) - top} more opened")
+    for incident in closed:
+        print(f"[{stamp}] anomaly closed: {describe(incident)} after "
+              f"{incident['closed'] - incident['opened']:.0f}s, peak score {incident['peak_score']:.3f}")
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-c","--continuous", action="store_true",
@@ -94,26 +200,67 @@ def main():
                         help="Seconds between checks (continuous mode)")
     parser.add_argument("-n","--top", type=int, default=5,
                         help="Max anomalies to show when printing")
+    parser.add_argument("--detector", choices=["forest", "online"], default="forest",
+                        help="forest: the registry IsolationForest; online: per-process baselines "
+                             "plus half-space trees learned while running (continuous mode only)")
+    parser.add_argument("--alpha", type=float, default=0.1,
+                        help="Weight of the newest tick in each process's baseline (online)")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="Ticks a process is observed before it can be flagged (online)")
+    parser.add_argument("--threshold", type=float, default=4.0,
+                        help="Deviation from its own baseline, in standard deviations, that flags a process (online)")
+    parser.add_argument("--window", type=int, default=2048,
+                        help="Process samples per half-space tree reference window (online)")
+    parser.add_argument("--events", default=DB_PATH,
+                        help=f"SQLite database of anomaly incidents (continuous mode, default: {DB_PATH})")
+    parser.add_argument("--no-events", action="store_true",
+                        help="Print every tick's anomalies instead of recording incidents")
+    parser.add_argument("--retention-days", type=float, default=30.0,
+                        help="Days closed incidents are kept (default: 30)")
+    parser.add_argument("--history", type=int, default=60,
+                        help="Ticks of per-process history for windowed features, 0 to disable (continuous mode)")
+    parser.add_argument("--leak-rate", type=float, default=100.0,
+                        help="Steady memory growth, in KB/s over a full history, flagged as a leak")
+    parser.add_argument("--runaway-cpu", type=float, default=90.0,
+                        help="Mean CPU %% over a full history that flags a long-running process")
+    parser.add_argument("--runaway-age", type=float, default=3600.0,
+                        help="Seconds a process must have run before --runaway-cpu applies")
+    parser.add_argument("--cgroups", action="store_true",
+                        help="Score cgroup v2 groups (containers, systemd slices) instead of processes. "
+                             "The forest model was trained on single processes, so it flags large groups "
+                             "for their size; use --detector online to learn each group's own baseline")
+    parser.add_argument("--cgroup-depth", type=int, default=None,
+                        help="Only score cgroups this many levels below the root (default: all)")
+    parser.add_argument("--all-cgroups", action="store_true",
+                        help="Also score the root and parent cgroups, whose counters include their children's")
     args = parser.parse_args()
+    if args.detector == "online" and not args.continuous:
+        parser.error("--detector online learns across ticks and needs --continuous")
 
     if args.continuous:
-        print(f"Monitoring for anomalies every {args.interval}s. Ctrl-C to stop.")
-        try:
-            while True:
-                df = get_process_metrics()
-                df = detect(df)
-                anoms = df[df['is_anomaly']]
-                if not anoms.empty:
-                    # sort by score ascending (most anomalous first)
-                    anoms = anoms.nsmallest(args.top, 'anomaly_score')
-                    print(f"\n[{time.strftime('%H:%M:%S')}] Detected {len(anoms)} anomalous process(es):")
-                    print(anoms[['name','anomaly_score']])
-                time.sleep(args.interval)
-        except KeyboardInterrupt:
-            print("\nStopped.")
+        online = None
+        if args.detector == "online":
+            features = online_metrics if args.history else perf_metrics
+            online = OnlineDetector(len(features), alpha=args.alpha, warmup=args.warmup,
+                                    threshold=args.threshold, window=args.window)
+        events = None if args.no_events else EventStore(args.events, args.retention_days)
+        history = ProcessHistory(args.history) if args.history else None
+        trend = partial(trend_decision, window=args.history, leak_rate=args.leak_rate,
+                        busy_cpu=args.runaway_cpu, runaway_age=args.runaway_age)
+        cgroups = None
+        if args.cgroups:
+            cgroups = CgroupSampler(max_depth=args.cgroup_depth, leaves_only=not args.all_cgroups)
+        run_continuous(args.interval, args.top, online, events, history, trend, cgroups)
+    elif args.cgroups:
+        df = detect(get_cgroup_metrics(CgroupSampler(max_depth=args.cgroup_depth, leaves_only=not args.all_cgroups)))
+        publish_scores(df)
+        df_sorted = df.sort_values(['is_anomaly','anomaly_score'],
+                                   ascending=[False, True])
+        print(df_sorted[['name', *perf_metrics, 'is_anomaly','anomaly_score']])
     else:
         df = get_process_metrics()
         df = detect(df)
+        publish_scores(df)
         df_sorted = df.sort_values(['is_anomaly','anomaly_score'],
                                    ascending=[False, True])
         print(df_sorted[['name', *perf_metrics, 'is_anomaly','anomaly_score']])
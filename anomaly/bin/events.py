@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Durable anomaly incidents, one per stretch of a process being flagged.
+
+An incident opens the first tick a process (pid, create time), or a cgroup
+(path, inode) when scoring cgroups, is flagged anomalous, is updated in
+memory while it stays flagged (tick count, peak and last score), and closes
+on the first tick it is no longer flagged or has exited. Changes are
+written to SQLite (WAL mode, so queries never block the detector) in one
+transaction every `flush_interval` seconds, closed incidents older than the
+retention period are pruned, and incidents still open when the detector
+stops are picked up again when it restarts. The key column holds the pid
+as text, or the cgroup path, which always starts with "/".
+
+    python3 anomaly/bin/events.py --since 6h --name python
+    python3 anomaly/bin/events.py --open --max-score -0.1
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+DB_PATH = os.environ.get(
+    "AIOS_ANOMALY_DB", os.path.join(os.path.expanduser("~"), ".local", "share", "aios", "anomaly-events.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    key TEXT NOT NULL,
+    create_time REAL NOT NULL,
+    name TEXT NOT NULL,
+    opened REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    closed REAL,
+    ticks INTEGER NOT NULL,
+    peak_score REAL NOT NULL,
+    last_score REAL NOT NULL,
+    PRIMARY KEY (key, create_time, opened)
+);
+CREATE INDEX IF NOT EXISTS incidents_opened ON incidents (opened);
+CREATE INDEX IF NOT EXISTS incidents_name ON incidents (name, opened);
+CREATE INDEX IF NOT EXISTS incidents_open ON incidents (closed) WHERE closed IS NULL;
+"""
+
+COLUMNS = ["key", "create_time", "name", "opened", "last_seen", "closed", "ticks", "peak_score", "last_score"]
+
+
+def connect(path=DB_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    if "pid" in [row[1] for row in db.execute("PRAGMA table_info(incidents)")]:
+        _migrate(db)
+    db.executescript(SCHEMA)
+    return db
+
+
+def _migrate(db):
+    """Rebuild a database from before cgroup scoring, whose integer pid column became the text key."""
+    with db:
+        db.execute("ALTER TABLE incidents RENAME TO incidents_old")
+        for index in ("incidents_opened", "incidents_name", "incidents_open"):
+            db.execute(f"DROP INDEX IF EXISTS {index}")
+        db.executescript(SCHEMA)
+        rest = ", ".join(COLUMNS[1:])
+        db.execute(f"INSERT INTO incidents (key, {rest}) SELECT CAST(pid AS TEXT), {rest} FROM incidents_old")
+        db.execute("DROP TABLE incidents_old")
+
+
+class EventStore:
+    """Opens, updates and closes incidents from each tick's scores and batches them to SQLite."""
+
+    def __init__(self, path=DB_PATH, retention_days=30.0, flush_interval=30.0):
+        self.db = connect(path)
+        self.retention = retention_days * 86400
+        self.flush_interval = flush_interval
+        self.flushed_at = time.monotonic()
+        self.pruned_at = 0.0
+        self.dirty = {}
+        self.open = {}
+        for row in self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM incidents WHERE closed IS NULL"):
+            incident = dict(zip(COLUMNS, row))
+            self.open[(incident["key"], incident["create_time"])] = incident
+
+    def observe(self, df, now=None):
+        """Fold one scored tick (anomaly.detect output) into the incidents.
+
+        Returns (opened, closed) lists of incidents changed by this tick.
+        """
+        now = time.time() if now is None else now
+        flagged = df[df['is_anomaly']]
+        opened, closed = [], []
+        seen = set()
+        for pid, name, create_time, score in zip(flagged.index.tolist(), flagged['name'].tolist(),
+                                                 flagged['create_time'].tolist(), flagged['anomaly_score'].tolist()):
+            key = (str(pid), create_time)
+            seen.add(key)
+            incident = self.open.get(key)
+            if incident is None:
+                incident = self.open[key] = {
+                    "key": key[0], "create_time": create_time, "name": name, "opened": now, "last_seen": now,
+                    "closed": None, "ticks": 0, "peak_score": score, "last_score": score}
+                opened.append(incident)
+            incident["last_seen"] = now
+            incident["ticks"] += 1
+            incident["peak_score"] = min(incident["peak_score"], score)
+            incident["last_score"] = score
+            self.dirty[key + (incident["opened"],)] = incident
+        for key in [key for key in self.open if key not in seen]:
+            incident = self.open.pop(key)
+            incident["closed"] = now
+            self.dirty[key + (incident["opened"],)] = incident
+            closed.append(incident)
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+        return opened, closed
+
+    def flush(self):
+        """Write every changed incident in one transaction and prune old ones."""
+        self.flushed_at = time.monotonic()
+        now = time.time()
+        with self.db:
+            if self.dirty:
+                self.db.executemany(
+                    f"INSERT INTO incidents ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                    "ON CONFLICT (key, create_time, opened) DO UPDATE SET last_seen = excluded.last_seen, "
+                    "closed = excluded.closed, ticks = excluded.ticks, peak_score = excluded.peak_score, "
+                    "last_score = excluded.last_score",
+                    [[incident[c] for c in COLUMNS] for incident in self.dirty.values()])
+                self.dirty.clear()
+            if now - self.pruned_at >= 3600:
+                self.pruned_at = now
+                self.db.execute("DELETE FROM incidents WHERE closed IS NOT NULL AND closed < ?",
+                                (now - self.retention,))
+
+    def close(self):
+        """Flush pending changes; open incidents stay open so a restart can continue them."""
+        self.flush()
+        self.db.close()
+
+
+def query(db, since=None, until=None, name=None, max_score=None, open_only=False, limit=100):
+    """Incidents overlapping [since, until], most anomalous first."""
+    where, params = [], []
+    if since is not None:
+        where.append("COALESCE(closed, last_seen) >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("opened <= ?")
+        params.append(until)
+    if name:
+        where.append("name LIKE ?")
+        params.append(f"%{name}%")
+    if max_score is not None:
+        where.append("peak_score <= ?")
+        params.append(max_score)
+    if open_only:
+        where.append("closed IS NULL")
+    sql = f"SELECT {', '.join(COLUMNS)} FROM incidents"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY peak_score ASC, opened DESC LIMIT ?"
+    return [dict(zip(COLUMNS, row)) for row in db.execute(sql, params + [limit])]
+
+
+def parse_time(value, now=None):
+    """Epoch seconds from an epoch number or a relative age like 90s, 15m, 6h or 2d."""
+    now = time.time() if now is None else now
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if match:
+        return now - float(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+    return float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List anomaly incidents recorded by anomaly.py --continuous.")
+    parser.add_argument("--db", default=DB_PATH, help=f"Incident database (default: {DB_PATH})")
+    parser.add_argument("--since", default=None, help="Epoch seconds or age, e.g. 30m, 6h, 2d")
+    parser.add_argument("--until", default=None, help="Epoch seconds or age, e.g. 1h")
+    parser.add_argument("--name", default=None, help="Process name substring")
+    parser.add_argument("--max-score", type=float, default=None,
+                        help="Only incidents whose peak score reached this or lower (more severe)")
+    parser.add_argument("--open", action="store_true", help="Only incidents still open")
+    parser.add_argument("-n", "--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"No incident database at {args.db}")
+    db = connect(args.db)
+    incidents = query(db, args.since and parse_time(args.since), args.until and parse_time(args.until),
+                      args.name, args.max_score, args.open, args.limit)
+    print(f"{'opened':<20}{'duration':>10}{'ticks':>7}{'peak':>9}  {'pid/cgroup':<10}  name")
+    for incident in incidents:
+        end = incident["closed"] or incident["last_seen"]
+        state = "" if incident["closed"] else " (open)"
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(incident['opened'])):<20}"
+              f"{end - incident['opened']:>9.0f}s{incident['ticks']:>7}{incident['peak_score']:>9.3f}"
+              f"  {incident['key']:<10}  {incident['name']}{state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Online anomaly detection that learns while it runs.
+
+Two models are updated from every tick, in O(features) per process:
+
+- ProcessBaselines keeps an exponentially weighted mean and variance of
+  every live process's own features, so a process is judged against its
+  own history rather than against the whole host.
+- HalfSpaceTrees (Tan, Ting & Liu, 2011) keeps mass counts in fixed random
+  trees over a sliding window of every process, so it knows which
+  feature combinations are currently common on the host.
+
+OnlineDetector flags a process only when it departs from its own baseline
+*and* lands somewhere the host has rarely been, so a busy training job
+that is always busy stays quiet. Features are compared on a log1p scale.
+Memory is bounded: baselines live in arrays sized to the tracked processes
+(see trends.Slots), dead processes are evicted every tick, and the trees
+never grow.
+"""
+import numpy as np
+
+from trends import Slots, fit
+
+
+class ProcessBaselines:
+    """Per-process exponentially weighted mean and variance, keyed by (pid, start time)."""
+
+    def __init__(self, n_features, alpha=0.1, warmup=5, min_std=0.25, max_size=8192):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.min_std = min_std
+        self.slots = Slots(max_size)
+        self.mean = np.zeros((0, n_features))
+        self.var = np.zeros((0, n_features))
+        self.count = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def update(self, keys, X):
+        """Largest per-feature z-score of every row against its process's baseline, then learn the row.
+
+        Rows whose process is still warming up (or untracked) score 0.
+        """
+        slots, new = self.slots.assign(keys)
+        if len(self.count) < self.slots.capacity:
+            self.mean, self.var, self.count = (fit(a, self.slots.capacity) for a in (self.mean, self.var, self.count))
+        tracked = slots >= 0
+        s, x = slots[tracked], X[tracked]
+        self.count[s[new[tracked]]] = 0
+        z = np.zeros(len(keys))
+        diff = x - self.mean[s]
+        ready = self.count[s] >= self.warmup
+        std = np.maximum(np.sqrt(self.var[s]), self.min_std)
+        z[tracked] = np.where(ready, np.abs(diff / std).max(axis=1, initial=0.0), 0.0)
+        first = self.count[s] == 0
+        self.mean[s] = np.where(first[:, None], x, self.mean[s] + self.alpha * diff)
+        self.var[s] = np.where(first[:, None], 0.0, (1 - self.alpha) * (self.var[s] + self.alpha * diff ** 2))
+        self.count[s] += 1
+        return z
+
+
+class HalfSpaceTrees:
+    """Streaming half-space trees with a tumbling reference window.
+
+    Trees are complete binary trees of fixed `depth` with random splits
+    over a workspace fitted to the first batch. Each window of `window`
+    rows is counted into the latest masses, which replace the reference
+    masses when the window fills. update() scores each row by the
+    density of its region relative to a uniform spread (1.0), so small
+    values mean the host has rarely been there.
+    """
+
+    def __init__(self, n_features, n_trees=25, depth=8, window=2048, size_limit=0.1, seed=0):
+        self.n_features = n_features
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window = window
+        self.size_limit = size_limit * window
+        self.rng = np.random.default_rng(seed)
+        self.split_feature = None
+        self.split_value = None
+        n_nodes = 2 ** (depth + 1) - 1
+        self.reference = np.zeros((n_trees, n_nodes))
+        self.latest = np.zeros((n_trees, n_nodes))
+        self.seen = 0
+        self.ready = False
+
+    def _build(self, X):
+        """Random splits over a perturbed workspace around the first batch (Tan et al., section 3)."""
+        lo, hi = X.min(axis=0), X.max(axis=0)
+        n_internal = 2 ** self.depth - 1
+        self.split_feature = np.empty((self.n_trees, n_internal), dtype=np.int64)
+        self.split_value = np.empty((self.n_trees, n_internal))
+        # features that were constant in the first batch would only waste splits
+        varying = np.flatnonzero(hi > lo)
+        if not len(varying):
+            varying = np.arange(self.n_features)
+        for t in range(self.n_trees):
+            s = self.rng.uniform(lo, hi)
+            width = 2 * np.maximum(np.maximum(s - lo, hi - s), 1e-3)
+            low, high = np.tile(s - width, (n_internal, 1)), np.tile(s + width, (n_internal, 1))
+            for node in range(n_internal):
+                f = self.rng.choice(varying)
+                mid = (low[node, f] + high[node, f]) / 2
+                self.split_feature[t, node], self.split_value[t, node] = f, mid
+                for child, side in ((2 * node + 1, 0), (2 * node + 2, 1)):
+                    if child < n_internal:
+                        low[child], high[child] = low[node], high[node]
+                        (high if side == 0 else low)[child, f] = mid
+
+    def _paths(self, X):
+        """Node index at every level for every tree and row: shape (trees, rows, depth + 1)."""
+        trees = np.arange(self.n_trees)[:, None]
+        node = np.zeros((self.n_trees, len(X)), dtype=np.int64)
+        paths = [node]
+        for _ in range(self.depth):
+            f = self.split_feature[trees, node]
+            right = X[np.arange(len(X))[None, :], f] > self.split_value[trees, node]
+            node = 2 * node + 1 + right
+            paths.append(node)
+        return np.stack(paths, axis=2)
+
+    def update(self, X):
+        """Density of every row under the reference window (NaN until one has filled), then learn the rows."""
+        if self.split_feature is None:
+            self._build(X)
+        paths = self._paths(X)
+        trees = np.arange(self.n_trees)[:, None, None]
+        density = np.full(len(X), np.nan)
+        if self.ready:
+            mass = self.reference[trees, paths]
+            # score at the first node on the path whose mass falls under the size limit, or the leaf
+            stop = np.where((mass < self.size_limit).any(axis=2), (mass < self.size_limit).argmax(axis=2), self.depth)
+            at = np.take_along_axis(mass, stop[..., None], axis=2)[..., 0]
+            density = (at * 2.0 ** stop).mean(axis=0) / self.window
+        start = 0
+        while start < len(X):
+            take = min(len(X) - start, self.window - self.seen)
+            np.add.at(self.latest, (trees, paths[:, start:start + take]), 1.0)
+            self.seen += take
+            start += take
+            if self.seen == self.window:
+                self.reference, self.latest = self.latest, np.zeros_like(self.latest)
+                self.seen = 0
+                self.ready = True
+        return density
+
+
+class OnlineDetector:
+    """Flags processes that leave their own baseline for a region the host rarely visits.
+
+    score() mirrors FlatIsolationForest.score: labels are -1 for anomalies
+    and 1 otherwise, and the decision is negative exactly for anomalies,
+    lower being more anomalous.
+    """
+
+    def __init__(self, n_features, alpha=0.1, warmup=5, threshold=4.0, rare=0.1, window=2048,
+                 max_processes=8192, seed=0):
+        self.threshold = threshold
+        self.rare = rare
+        self.baselines = ProcessBaselines(n_features, alpha, warmup, max_size=max_processes)
+        self.trees = HalfSpaceTrees(n_features, window=window, seed=seed)
+
+    def score(self, X, keys):
+        X = np.log1p(np.maximum(np.asarray(X, dtype=np.float64), 0.0))
+        if not len(X):
+            return np.ones(0, dtype=int), np.zeros(0)
+        z = self.baselines.update(keys, X)
+        density = self.trees.update(X)
+        # rare means well below the host's typical density this tick; until the
+        # first window fills, only the baselines decide
+        typical = np.median(density) if self.trees.ready else 1.0
+        rarity = np.log2(np.nan_to_num(density, nan=0.0) + 1e-12) - np.log2(self.rare * typical + 1e-12)
+        decision = np.maximum((self.threshold - z) / self.threshold, rarity / 10.0)
+        return np.where(decision < 0, -1, 1), decision
+
+    def info(self):
+        return {"tracked": len(self.baselines), "window_ready": self.trees.ready}
@@ -0,0 +1,171 @@
+"""Per-process ring histories and the windowed features computed from them.
+
+A snapshot only shows where a process is now; a slow memory leak or a job
+that has been pegging a core for hours looks normal tick by tick.
+ProcessHistory keeps the last `window` ticks of CPU, memory and I/O for
+every live process in fixed-size NumPy rings (one row per process, grown
+on demand and reused when a process exits) and derives, for all
+processes at once:
+
+    Memory slope [KB/s]  least-squares growth of resident memory
+    Memory trend R2      how steadily it grows (1.0 = a straight line)
+    CPU mean [%]         and CPU variance over the window
+    I/O burstiness       coefficient of variation of disk writes
+    Age [s]              time since the process started
+
+trend_decision() turns sustained growth and long CPU-bound runs into a
+decision in the detectors' convention (negative = anomalous).
+"""
+import time
+
+import numpy as np
+
+window_metrics = [
+    'Memory slope [KB/s]',
+    'Memory trend R2',
+    'CPU mean [%]',
+    'CPU variance',
+    'I/O burstiness',
+    'Age [s]'
+]
+
+
+class Slots:
+    """Row allocator for per-process arrays keyed by (pid, start time).
+
+    Keys missing from a tick are released, so rows track live processes;
+    capacity doubles as needed up to max_size, after which new processes
+    are left untracked (row -1).
+    """
+
+    def __init__(self, max_size=8192, initial=256):
+        self.max_size = max_size
+        self.capacity = min(initial, max_size)
+        self.rows = {}
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def assign(self, keys):
+        """(row of every key, mask of rows newly assigned this tick)."""
+        present = set(keys)
+        for key in [key for key in self.rows if key not in present]:
+            self.free.append(self.rows.pop(key))
+        rows = np.empty(len(keys), dtype=np.int64)
+        new = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            row = self.rows.get(key)
+            if row is None:
+                if not self.free and self.capacity < self.max_size:
+                    grown = min(self.capacity * 2, self.max_size)
+                    self.free = list(range(grown - 1, self.capacity - 1, -1))
+                    self.capacity = grown
+                if not self.free:
+                    rows[i] = -1
+                    continue
+                row = self.rows[key] = self.free.pop()
+                new[i] = True
+            rows[i] = row
+        return rows, new
+
+
+def fit(array, capacity):
+    """`array` padded with zero rows to `capacity` rows."""
+    if len(array) >= capacity:
+        return array
+    return np.concatenate([array, np.zeros((capacity - len(array),) + array.shape[1:], dtype=array.dtype)])
+
+
+class ProcessHistory:
+    """Last `window` ticks of every live process, and windowed features over them."""
+
+    def __init__(self, window=60, max_size=8192):
+        self.window = window
+        self.slots = Slots(max_size)
+        self.position = -1
+        self.count = np.zeros(0, dtype=np.int64)
+        self.time = np.zeros((0, window))
+        self.cpu = np.zeros((0, window))
+        self.memory = np.zeros((0, window))
+        self.io = np.zeros((0, window))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def update(self, df, now=None, wall=None):
+        """Append one tick of process_features output and return its windowed features.
+
+        Slopes are taken against the monotonic clock `now`, ages against the
+        wall clock `wall`. Untracked processes (table full) get NaN, and so
+        does the age of cgroups, whose create_time is an inode.
+        """
+        now = time.monotonic() if now is None else now
+        wall = time.time() if wall is None else wall
+        rows, new = self.slots.assign(list(zip(df.index.tolist(), df['create_time'].tolist())))
+        capacity = self.slots.capacity
+        if len(self.count) < capacity:
+            self.count = fit(self.count, capacity)
+            self.time, self.cpu, self.memory, self.io = (
+                fit(a, capacity) for a in (self.time, self.cpu, self.memory, self.io))
+        self.position = (self.position + 1) % self.window
+        tracked = rows >= 0
+        r = rows[tracked]
+        self.count[r[new[tracked]]] = 0
+        p = self.position
+        self.time[r, p] = now
+        self.cpu[r, p] = df['CPU usage [%]'].to_numpy(dtype=float)[tracked]
+        self.memory[r, p] = df['Memory usage [KB]'].to_numpy(dtype=float)[tracked]
+        self.io[r, p] = df['Disk write throughput [KB/s]'].to_numpy(dtype=float)[tracked]
+        self.count[r] += 1
+
+        # ring cells written within each process's lifetime
+        age = (p - np.arange(self.window)) % self.window
+        valid = age[None, :] < np.minimum(self.count[r], self.window)[:, None]
+        n = valid.sum(axis=1)
+
+        def mean(values):
+            return np.where(valid, values, 0.0).sum(axis=1) / n
+
+        t = self.time[r] - now
+        y = self.memory[r]
+        dt = np.where(valid, t - mean(t)[:, None], 0.0)
+        dy = np.where(valid, y - mean(y)[:, None], 0.0)
+        var_t, var_y, cov = (dt * dt).sum(axis=1), (dy * dy).sum(axis=1), (dt * dy).sum(axis=1)
+        slope = np.divide(cov, var_t, out=np.zeros(len(r)), where=(var_t > 0) & (n >= 3))
+        r2 = np.divide(cov * cov, var_t * var_y, out=np.zeros(len(r)), where=(var_t > 0) & (var_y > 0) & (n >= 3))
+        cpu_mean = mean(self.cpu[r])
+        cpu_var = mean(self.cpu[r] ** 2) - cpu_mean ** 2
+        io_mean = mean(self.io[r])
+        io_std = np.sqrt(np.maximum(mean(self.io[r] ** 2) - io_mean ** 2, 0.0))
+
+        out = np.full((len(df), len(window_metrics) - 1), np.nan)
+        out[tracked] = np.column_stack([
+            slope, r2, cpu_mean, np.maximum(cpu_var, 0.0),
+            np.divide(io_std, io_mean, out=np.zeros(len(r)), where=io_mean > 0),
+        ])
+        features = dict(zip(window_metrics, out.T))
+        if df.index.name == "cgroup":
+            features['Age [s]'] = np.full(len(df), np.nan)
+        else:
+            features['Age [s]'] = np.maximum(wall - df['create_time'].to_numpy(dtype=float), 0.0)
+        features['ticks'] = np.zeros(len(df), dtype=np.int64)
+        features['ticks'][tracked] = np.minimum(self.count[r], self.window)
+        return features
+
+
+def trend_decision(features, window, leak_rate=100.0, min_r2=0.8, busy_cpu=90.0, runaway_age=3600.0):
+    """Negative for processes leaking memory or running CPU-bound for too long.
+
+    Both need a full window: a leak is memory growing faster than
+    `leak_rate` KB/s with at least `min_r2` fit to a straight line; a
+    runaway has averaged `busy_cpu`% or more over the window and is older
+    than `runaway_age` seconds, so it never applies without an age (cgroups).
+    Other processes get +1.
+    """
+    full = features['ticks'] >= window
+    leaking = full & (features['Memory trend R2'] >= min_r2)
+    leak = np.where(leaking, (leak_rate - features['Memory slope [KB/s]']) / leak_rate, 1.0)
+    running = full & (features['Age [s]'] >= runaway_age)
+    runaway = np.where(running, (busy_cpu - features['CPU mean [%]']) / busy_cpu, 1.0)
+    return np.minimum(np.minimum(leak, runaway), 1.0)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Per-tick overhead of the monitoring tools as a function of process count.
+
+Every collector samples a synthetic /proc tree (see procfs.py) of each
+requested size. Wall-clock latency and CPU time of each tick are recorded;
+the fixture update between ticks is not timed. Results are appended to a
+JSON-lines file, one row per (collector, process count), and compared with
+the most recent earlier row of the same host: the run exits with status 1
+when a median regresses by more than --threshold.
+
+    python3 benchmarks/collector_bench.py --counts 100 1000 5000
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ("anomaly/bin", "scheduler/bin", "dashboard/bin", "resource-monitor", "."):
+    sys.path.insert(0, os.path.join(ROOT, path))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("AIOS_GPU_BACKEND", "fake")
+
+from common.sampler import Sampler
+from procfs import SyntheticCgroups, SyntheticProc
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results.jsonl")
+
+
+def resource_monitor_tick(proc_root):
+    import resource_monitor
+    sampler = Sampler(proc_root, gpu=True)
+
+    def tick():
+        snap, gpus, entry = resource_monitor.collect(sampler)
+        resource_monitor.format_entry(*entry)
+        resource_monitor.to_record(snap, gpus)
+    return tick
+
+
+def anomaly_tick(proc_root):
+    import anomaly
+    sampler = Sampler(proc_root)
+    return lambda: anomaly.process_features(sampler.sample())
+
+
+def anomaly_cgroups_tick(proc_root):
+    """anomaly.py --cgroups on a host packing about 20 processes into each container."""
+    import anomaly
+    from common.cgroups import CgroupSampler
+    count = sum(name.isdigit() for name in os.listdir(proc_root)) // 20
+    groups = SyntheticCgroups(os.path.join(os.path.dirname(proc_root), "cgroup"), count)
+    sampler = CgroupSampler(groups.root)
+
+    def tick():
+        groups.advance()
+        return anomaly.cgroup_features(sampler.sample())
+    return tick
+
+
+def scheduler_tick(proc_root):
+    import schedule
+    sampler = Sampler(proc_root)
+    return lambda: schedule.get_values(sampler)
+
+
+def dashboard_tick(proc_root):
+    import dashboard
+    from history import History
+    dashboard.sampler = Sampler(proc_root, gpu=True)
+    dashboard.resource_history = History()
+    return dashboard.sample_resources
+
+
+COLLECTORS = {
+    "resource_monitor": resource_monitor_tick,
+    "anomaly": anomaly_tick,
+    "anomaly_cgroups": anomaly_cgroups_tick,
+    "scheduler": scheduler_tick,
+    "dashboard": dashboard_tick,
+}
+
+
+def measure(make_tick, fixture, ticks, warmup=2):
+    """Time `ticks` ticks of one collector; returns (latencies, cpu times) in ms."""
+    tick = make_tick(fixture.proc)
+    for _ in range(warmup):
+        fixture.advance()
+        tick()
+    latency, cpu = [], []
+    for _ in range(ticks):
+        fixture.advance()
+        wall, used = time.perf_counter(), time.process_time()
+        tick()
+        cpu.append((time.process_time() - used) * 1000.0)
+        latency.append((time.perf_counter() - wall) * 1000.0)
+    return latency, cpu
+
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        "median": round(statistics.median(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history, row):
+    for old in reversed(history):
+        if (old["collector"], old["processes"], old["host"]) == (row["collector"], row["processes"], row["host"]):
+            return old
+    return None
+
+
+def regressions(row, baseline, threshold, min_delta):
+    """Metrics whose median grew by more than `threshold` (and `min_delta` ms)."""
+    found = []
+    for metric in ("latency_ms", "cpu_ms"):
+        old, new = baseline[metric]["median"], row[metric]["median"]
+        if new > old * (1 + threshold) and new - old > min_delta:
+            found.append(f"{metric} {old:.2f} -> {new:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-tick collector overhead.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="Synthetic process counts (default: 100 1000 5000)")
+    parser.add_argument("--collectors", nargs="+", choices=list(COLLECTORS), default=list(COLLECTORS),
+                        help="Collectors to benchmark (default: all)")
+    parser.add_argument("--ticks", type=int, default=20, help="Timed ticks per measurement (default: 20)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON-lines results file")
+    parser.add_argument("--baseline", default=None,
+                        help="Compare against this results file instead of --output")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown of a median before failing (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many ms (default: 0.5)")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the results")
+    args = parser.parse_args()
+
+    history = load_results(args.baseline or args.output)
+    run = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+    }
+    rows, failures = [], []
+    print(f"{'collector':<18}{'processes':>10}{'median ms':>11}{'p95 ms':>9}{'cpu ms':>9}  baseline")
+    with tempfile.TemporaryDirectory(prefix="aios-bench-") as tmp:
+        for count in args.counts:
+            fixture = SyntheticProc(os.path.join(tmp, str(count)), count)
+            for name in args.collectors:
+                latency, cpu = measure(COLLECTORS[name], fixture, args.ticks)
+                row = dict(run, collector=name, processes=count, ticks=args.ticks,
+                           latency_ms=summarize(latency), cpu_ms=summarize(cpu))
+                rows.append(row)
+                baseline = find_baseline(history, row)
+                if baseline is None:
+                    status = "-"
+                else:
+                    slower = regressions(row, baseline, args.threshold, args.min_delta)
+                    status = "REGRESSION " + ", ".join(slower) if slower else "ok"
+                    if slower:
+                        failures.append(f"{name} @ {count}: " + ", ".join(slower))
+                print(f"{name:<18}{count:>10}{row['latency_ms']['median']:>11.2f}"
+                      f"{row['latency_ms']['p95']:>9.2f}{row['cpu_ms']['median']:>9.2f}  {status}")
+            fixture.close()
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    if failures:
+        print("\nRegressions beyond {:.0%}:".format(args.threshold))
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""sklearn vs flat-array prediction of the scheduler's burst-time forest.
+
+Times scaler.transform + RandomForestRegressor.predict on a DataFrame (what
+schedule.py used to do) against FlatForest.predict on raw features, and
+checks that both give the same predictions.
+
+    python3 benchmarks/forest_bench.py --rows 100 1000 10000
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from common.forest import FlatForest
+
+warnings.filterwarnings("ignore", message="Trying to unpickle estimator.*version.*", category=UserWarning)
+
+FEATURES = [
+    'CPU capacity provisioned [MHZ]',
+    'Memory capacity provisioned [KB]',
+    'Memory usage [KB]',
+    'Disk write throughput [KB/s]',
+    'CPU cores'
+]
+
+
+def synthetic_features(rows, seed=0):
+    """Feature rows drawn around the scaler's training distribution."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CPU capacity provisioned [MHZ]': rng.choice([2400.0, 2900.0, 3600.0], rows),
+        'Memory capacity provisioned [KB]': rng.lognormal(13, 1.5, rows),
+        'Memory usage [KB]': rng.lognormal(16, 2, rows),
+        'Disk write throughput [KB/s]': rng.exponential(50, rows) * (rng.random(rows) < 0.2),
+        'CPU cores': rng.choice([4.0, 8.0, 16.0, 32.0], rows),
+    })
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sklearn and flat-array forest inference.")
+    parser.add_argument("--model", default=os.path.join(ROOT, "scheduler", "bin", "process-scheduler.pkl"))
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size; the best is reported")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        state = pickle.load(f)
+    model, scaler = state["model"], state["scaler"]
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(model, scaler)
+    print(f"Flattened {len(forest.roots)} trees ({len(forest.feature)} nodes) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'rows':>8}{'sklearn ms':>12}{'flat ms':>10}{'speedup':>9}{'max abs diff':>14}{'mismatches':>12}")
+    failed = False
+    for rows in args.rows:
+        df = synthetic_features(rows)
+        sk_ms, expected = best_of(lambda: model.predict(scaler.transform(df[FEATURES])), args.repeat)
+        flat_ms, got = best_of(lambda: forest.predict(df[FEATURES].to_numpy(dtype=float)), args.repeat)
+        diff = np.abs(got - expected)
+        # Inputs within float rounding of a split may take the other branch
+        mismatches = int((diff > 1e-9 * np.maximum(1.0, np.abs(expected))).sum())
+        failed |= mismatches > rows * 0.001
+        print(f"{rows:>8}{sk_ms:>12.2f}{flat_ms:>10.2f}{sk_ms / flat_ms:>8.1f}x{diff.max():>14.2e}{mismatches:>12}")
+    if failed:
+        sys.exit("Flat predictions diverge from sklearn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""sklearn vs single-pass flat-array scoring of the anomaly detector.
+
+Times what anomaly.py used to do per tick (scaler.transform, then
+IsolationForest.predict and decision_function, each a full traversal)
+against FlatIsolationForest.score, which derives both from one pass over
+the raw features, and checks that labels and scores agree.
+
+    python3 benchmarks/isolation_bench.py --rows 1000 10000 100000
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from common.forest import FlatIsolationForest
+
+warnings.filterwarnings("ignore", message="Trying to unpickle estimator.*version.*", category=UserWarning)
+warnings.filterwarnings("ignore", message="X does not have valid feature names.*", category=UserWarning)
+
+FEATURES = [
+    'CPU usage [%]',
+    'Memory usage [KB]',
+    'Disk write throughput [KB/s]',
+    'Network received throughput [KB/s]',
+    'Network transmitted throughput [KB/s]'
+]
+
+
+def synthetic_features(rows, seed=0):
+    """Process rows shaped like anomaly.process_features output, with a few outliers."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'CPU usage [%]': rng.exponential(2, rows),
+        'Memory usage [KB]': rng.lognormal(10, 1.5, rows),
+        'Disk write throughput [KB/s]': rng.exponential(20, rows) * (rng.random(rows) < 0.1),
+        'Network received throughput [KB/s]': 0.0,
+        'Network transmitted throughput [KB/s]': 0.0,
+    })
+    outliers = rng.random(rows) < 0.01
+    df.loc[outliers, 'CPU usage [%]'] *= 50
+    return df
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000.0, result
+
+
+def sklearn_score(model, scaler, df):
+    X = scaler.transform(df[FEATURES]) if scaler is not None else df[FEATURES]
+    return model.predict(X), model.decision_function(X)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sklearn and single-pass IsolationForest scoring.")
+    parser.add_argument("--model", default=os.path.join(ROOT, "anomaly", "bin", "anomaly-detector.pkl"))
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the best is reported")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        state = pickle.load(f)
+    model, scaler = state["model"], state.get("scaler")
+    start = time.perf_counter()
+    forest = FlatIsolationForest.from_sklearn(model, scaler)
+    print(f"Flattened {len(forest.forest.roots)} trees ({len(forest.forest.feature)} nodes) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'rows':>8}{'sklearn ms':>12}{'flat ms':>10}{'speedup':>9}{'max abs diff':>14}{'label diffs':>13}")
+    failed = False
+    for rows in args.rows:
+        df = synthetic_features(rows)
+        sk_ms, (sk_labels, sk_scores) = best_of(lambda: sklearn_score(model, scaler, df), args.repeat)
+        flat_ms, (labels, scores) = best_of(lambda: forest.score(df[FEATURES].to_numpy(dtype=float)), args.repeat)
+        diff = np.abs(scores - sk_scores)
+        # Inputs within float rounding of a split may take the other branch
+        label_diffs = int((labels != sk_labels).sum())
+        failed |= label_diffs > rows * 0.001 or np.median(diff) > 1e-9
+        print(f"{rows:>8}{sk_ms:>12.2f}{flat_ms:>10.2f}{sk_ms / flat_ms:>8.1f}x{diff.max():>14.2e}{label_diffs:>13}")
+    if failed:
+        sys.exit("Flat scores diverge from sklearn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Synthetic /proc and cgroup trees for benchmarking the collectors.
+
+SyntheticProc lays out <root>/proc and <root>/sys/block with the files the
+shared sampler reads (stat, net/dev, diskstats and <pid>/stat, <pid>/io) for
+an arbitrary number of processes, so collector cost can be measured at
+process counts the benchmark host does not actually run. SyntheticCgroups
+does the same for a cgroup v2 hierarchy of container scopes.
+"""
+import os
+import random
+import shutil
+
+STAT = ("{pid} ({name}) S {ppid} {pid} {pid} 0 -1 4194304 {minflt} 0 0 0 {utime} {stime} 0 0 20 0 "
+        "{threads} 0 {start} {vsize} {rss} 18446744073709551615 1 1 0 0 0 0 0 0 0 0 0 0 17 {cpu} 0 0 0 0 0\n")
+IO = ("rchar: {rchar}\nwchar: {wchar}\nsyscr: {syscr}\nsyscw: {syscw}\n"
+      "read_bytes: {read}\nwrite_bytes: {write}\ncancelled_write_bytes: 0\n")
+NAMES = ["python", "bash", "sshd", "postgres", "nginx", "java", "node", "kworker/0:1", "systemd", "containerd"]
+
+
+class SyntheticProc:
+    """A fake procfs with `count` processes whose counters move on advance()."""
+
+    def __init__(self, root, count, cores=8, nics=2, disks=2, seed=0):
+        self.root = root
+        self.proc = os.path.join(root, "proc")
+        self.cores = cores
+        self.nics = ["lo"] + [f"eth{i}" for i in range(nics - 1)]
+        self.disks = [f"vd{chr(ord('a') + i)}" for i in range(disks)]
+        self.random = random.Random(seed)
+        self.ticks = 0
+        self.next_pid = 1
+        self.processes = {}
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(os.path.join(self.proc, "net"))
+        for disk in self.disks:
+            os.makedirs(os.path.join(root, "sys", "block", disk))
+        for _ in range(count):
+            self.spawn()
+        self._write_host()
+
+    def spawn(self):
+        """Add a process with random (but plausible) counters."""
+        pid = self.next_pid
+        self.next_pid += 1
+        rnd = self.random
+        proc = {
+            "pid": pid,
+            "name": rnd.choice(NAMES),
+            "ppid": rnd.randint(1, pid),
+            "start": self.ticks * 100 + rnd.randint(0, 99),
+            "utime": rnd.randint(0, 10000),
+            "stime": rnd.randint(0, 5000),
+            "threads": rnd.randint(1, 64),
+            "vsize": rnd.randint(1, 4096) * 1024 * 1024,
+            "rss": rnd.randint(100, 200000),
+            "read": rnd.randint(0, 1 << 30),
+            "write": rnd.randint(0, 1 << 30),
+            # kernel threads and other users' processes often have no readable io
+            "io": rnd.random() > 0.1,
+        }
+        self.processes[pid] = proc
+        os.mkdir(os.path.join(self.proc, str(pid)))
+        self._write_process(proc)
+        return pid
+
+    def kill(self, pid):
+        del self.processes[pid]
+        shutil.rmtree(os.path.join(self.proc, str(pid)))
+
+    def advance(self, busy=0.1, churn=0.01):
+        """Move the counters of a `busy` fraction of processes and replace a `churn` fraction."""
+        self.ticks += 1
+        rnd = self.random
+        pids = list(self.processes)
+        for pid in rnd.sample(pids, int(len(pids) * churn)):
+            self.kill(pid)
+            self.spawn()
+        for pid in rnd.sample(list(self.processes), int(len(self.processes) * busy)):
+            proc = self.processes[pid]
+            proc["utime"] += rnd.randint(0, 100)
+            proc["stime"] += rnd.randint(0, 20)
+            proc["rss"] += rnd.randint(-100, 100)
+            proc["write"] += rnd.randint(0, 1 << 20)
+            self._write_process(proc)
+        self._write_host()
+
+    def _write_process(self, proc):
+        base = os.path.join(self.proc, str(proc["pid"]))
+        with open(os.path.join(base, "stat"), "w") as f:
+            f.write(STAT.format(minflt=proc["utime"] * 3, cpu=proc["pid"] % self.cores, **proc))
+        io = os.path.join(base, "io")
+        if proc["io"]:
+            with open(io, "w") as f:
+                f.write(IO.format(rchar=proc["read"] * 2, wchar=proc["write"] * 2, syscr=proc["read"] // 4096,
+                                  syscw=proc["write"] // 4096, read=proc["read"], write=proc["write"]))
+
+    def _write_host(self):
+        t = self.ticks
+        lines = [f"cpu{i} {1000 * t + 10 * i} 0 {300 * t} {700 * t} 5 0 1 0 0 0" for i in range(self.cores)]
+        total = " ".join(str(sum(int(line.split()[k]) for line in lines)) for k in range(1, 11))
+        with open(os.path.join(self.proc, "stat"), "w") as f:
+            f.write(f"cpu  {total}\n" + "\n".join(lines) + "\nbtime 1700000000\nprocesses 100000\n")
+        with open(os.path.join(self.proc, "net", "dev"), "w") as f:
+            f.write("Inter-|   Receive                            |  Transmit\n"
+                    " face |bytes    packets errs drop fifo frame compressed multicast|"
+                    "bytes    packets errs drop fifo colls carrier compressed\n")
+            for i, nic in enumerate(self.nics):
+                rx, tx = 150000 * t * (i + 1), 40000 * t * (i + 1)
+                f.write(f"{nic:>6}: {rx} {rx // 1500} 0 0 0 0 0 0 {tx} {tx // 1500} 0 0 0 0 0 0\n")
+        with open(os.path.join(self.proc, "diskstats"), "w") as f:
+            for i, disk in enumerate(self.disks):
+                f.write(f" 253 {16 * i} {disk} {50 * t} 0 {800 * t} 10 {200 * t} 0 {4000 * t} 20 0 {30 * t} 30\n")
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class SyntheticCgroups:
+    """A fake cgroup v2 hierarchy: system.slice and user.slice holding `count` container scopes."""
+
+    def __init__(self, root, count, seed=0):
+        self.root = root
+        self.random = random.Random(seed)
+        self.groups = {}
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(root)
+        with open(os.path.join(root, "cgroup.controllers"), "w") as f:
+            f.write("cpuset cpu io memory pids\n")
+        for slice_ in ("system.slice", "user.slice"):
+            self._add(slice_)
+        for _ in range(count):
+            scope = "docker-%064x.scope" % self.random.getrandbits(256)
+            self._add(os.path.join("system.slice", scope))
+        self.advance(busy=1.0)
+
+    def _add(self, rel):
+        os.makedirs(os.path.join(self.root, rel))
+        self.groups[rel] = {"usage": 0, "memory": self.random.randint(1 << 20, 1 << 32),
+                            "rbytes": 0, "wbytes": 0, "rios": 0, "wios": 0, "pids": self.random.randint(1, 200)}
+
+    def advance(self, busy=0.1):
+        """Move the counters of a `busy` fraction of cgroups."""
+        rnd = self.random
+        for rel in rnd.sample(list(self.groups), int(len(self.groups) * busy)):
+            group = self.groups[rel]
+            group["usage"] += rnd.randint(0, 2000000)
+            group["memory"] = max(0, group["memory"] + rnd.randint(-1 << 20, 1 << 20))
+            group["wbytes"] += rnd.randint(0, 1 << 20)
+            group["wios"] += rnd.randint(0, 256)
+            group["rbytes"] += rnd.randint(0, 1 << 18)
+            group["rios"] += rnd.randint(0, 64)
+            base = os.path.join(self.root, rel)
+            with open(os.path.join(base, "cpu.stat"), "w") as f:
+                f.write(f"usage_usec {group['usage']}\nuser_usec {group['usage'] // 2}\n"
+                        f"system_usec {group['usage'] // 2}\n")
+            with open(os.path.join(base, "memory.current"), "w") as f:
+                f.write(f"{group['memory']}\n")
+            with open(os.path.join(base, "io.stat"), "w") as f:
+                f.write(f"253:0 rbytes={group['rbytes']} wbytes={group['wbytes']} rios={group['rios']} "
+                        f"wios={group['wios']} dbytes=0 dios=0\n")
+            with open(os.path.join(base, "pids.current"), "w") as f:
+                f.write(f"{group['pids']}\n")
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1 @@
+"""Shared helpers used by the monitoring, anomaly and scheduler tools."""
@@ -0,0 +1,221 @@
+"""Flat-array inference for the scheduler's and the anomaly detector's forests.
+
+Every tree of a fitted sklearn forest is copied into one set of concatenated
+node arrays (feature, threshold, left, right, value). The StandardScaler is
+folded into the thresholds (x_scaled <= t  <=>  x <= t * scale + mean), so
+raw features go straight in, and the arrays are what the model registry
+(common.models) stores.
+
+Forests whose trees have at most 64 leaves (the scheduler's are depth 6)
+are scored without walking the trees: each split that sends a row right
+rules out the leaves of its left subtree, so per feature the splits are
+sorted by threshold and the AND of their "remaining leaves" bitmasks is
+precomputed for every prefix. One searchsorted per feature then gives the
+remaining leaves of every tree, and the exit leaf is the lowest set bit.
+Larger trees fall back to a level-by-level batch traversal.
+"""
+import numpy as np
+
+ARRAYS = ("roots", "feature", "threshold", "left", "right", "value")
+SCHEMA = "flat-forest/1"
+ISOLATION_SCHEMA = "flat-isolation-forest/1"
+
+
+class FlatForest:
+    """A regression forest as flat NumPy node arrays."""
+
+    def __init__(self, roots, feature, threshold, left, right, value, depth, n_features):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.depth = int(depth)
+        self.n_features = int(n_features)
+        self.compiled = None
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """Flatten a fitted RandomForestRegressor, folding in an optional StandardScaler."""
+        return cls._flatten(model, scaler, lambda tree, depth: tree.value[:, 0, 0])
+
+    @classmethod
+    def _flatten(cls, model, scaler, leaf_values):
+        n_features = model.n_features_in_
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if getattr(scaler, "mean_", None) is not None:
+                mean = scaler.mean_
+            if getattr(scaler, "scale_", None) is not None:
+                scale = scaler.scale_
+        tree_features = getattr(model, "estimators_features_", None)
+        roots, feature, threshold, left, right, value = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for i, estimator in enumerate(model.estimators_):
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(offset, offset + n)
+            leaf = tree.children_left < 0
+            f = np.where(leaf, 0, tree.feature)
+            if tree_features is not None:
+                # trees fitted on a feature subset index into that subset
+                f = np.asarray(tree_features[i])[f]
+            node_depth = np.zeros(n, dtype=np.intp)
+            for node in np.flatnonzero(~leaf).tolist():
+                node_depth[tree.children_left[node]] = node_depth[tree.children_right[node]] = node_depth[node] + 1
+            roots.append(offset)
+            feature.append(f)
+            threshold.append(np.where(leaf, 0.0, tree.threshold * scale[f] + mean[f]))
+            left.append(np.where(leaf, ids, tree.children_left + offset))
+            right.append(np.where(leaf, ids, tree.children_right + offset))
+            value.append(leaf_values(tree, node_depth))
+            depth = max(depth, tree.max_depth)
+            offset += n
+        return cls(
+            np.array(roots, dtype=np.intp),
+            np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.intp),
+            np.concatenate(right).astype(np.intp),
+            np.concatenate(value).astype(np.float64),
+            depth,
+            n_features,
+        )
+
+    def to_arrays(self):
+        """Arrays and metadata for common.models.save_bundle."""
+        return {name: getattr(self, name) for name in ARRAYS}, {"depth": self.depth, "n_features": self.n_features}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(*(arrays[name] for name in ARRAYS), meta["depth"], meta["n_features"])
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        bundle.require(SCHEMA, ARRAYS)
+        return cls.from_arrays(bundle.arrays, bundle.meta)
+
+    def _compile(self):
+        """Build the per-feature prefix bitmask tables (trees of at most 64 leaves)."""
+        n_trees = len(self.roots)
+        ends = np.append(self.roots[1:], len(self.feature))
+        internal = self.left != np.arange(len(self.left))
+        if not n_trees or np.add.reduceat(~internal, self.roots).max() > 64:
+            return False
+        left, right, value = self.left.tolist(), self.right.tolist(), self.value.tolist()
+        leaf_values = np.zeros((n_trees, 64))
+        masks = np.zeros(len(self.feature), dtype=np.uint64)
+        for tree, root in enumerate(self.roots.tolist()):
+            leaves = []
+
+            def walk(node):
+                """Number leaves left to right; returns the bitmask of leaves under node."""
+                if left[node] == node:
+                    leaf_values[tree, len(leaves)] = value[node]
+                    leaves.append(node)
+                    return 1 << (len(leaves) - 1)
+                under_left = walk(left[node])
+                masks[node] = ~under_left & 0xFFFFFFFFFFFFFFFF
+                return under_left | walk(right[node])
+            walk(root)
+        tree_of = np.repeat(np.arange(n_trees), ends - self.roots)
+        self.split_thresholds, self.prefix_masks = [], []
+        for f in range(self.n_features):
+            nodes = np.flatnonzero(internal & (self.feature == f))
+            nodes = nodes[np.argsort(self.threshold[nodes], kind="stable")]
+            table = np.full((len(nodes) + 1, n_trees), 0xFFFFFFFFFFFFFFFF, dtype=np.uint64)
+            table[np.arange(1, len(nodes) + 1), tree_of[nodes]] = masks[nodes]
+            self.split_thresholds.append(self.threshold[nodes])
+            self.prefix_masks.append(np.bitwise_and.accumulate(table, axis=0))
+        self.leaf_values = leaf_values.ravel()
+        # frexp(2**k) gives exponent k + 1; fold the -1 into each tree's row offset
+        self.leaf_offsets = np.arange(n_trees) * 64 - 1
+        return True
+
+    def predict(self, X, chunk=512):
+        """Mean leaf value over all trees for every row of raw (unscaled) X."""
+        X = np.asarray(X, dtype=np.float64)
+        if self.compiled is None:
+            self.compiled = self._compile()
+        out = np.empty(len(X))
+        for start in range(0, len(X), chunk):
+            rows = X[start:start + chunk]
+            out[start:start + chunk] = self._predict_masks(rows) if self.compiled else self._predict_walk(rows)
+        return out
+
+    def _predict_masks(self, rows):
+        # splits with threshold < x send the row right
+        remaining = self.prefix_masks[0].take(np.searchsorted(self.split_thresholds[0], rows[:, 0]), axis=0)
+        for f in range(1, self.n_features):
+            remaining &= self.prefix_masks[f].take(np.searchsorted(self.split_thresholds[f], rows[:, f]), axis=0)
+        lowest = remaining & (~remaining + np.uint64(1))
+        leaf = np.frexp(lowest.astype(np.float64))[1] + self.leaf_offsets
+        return self.leaf_values.take(leaf).mean(axis=1)
+
+    def _predict_walk(self, rows):
+        index = np.arange(len(rows))
+        node = np.repeat(self.roots[:, None], len(rows), axis=1)
+        for _ in range(self.depth):
+            go_left = rows[index, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=0)
+
+
+def average_path_length(n):
+    """Expected path length of an unsuccessful BST search among n points (as in sklearn)."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class FlatIsolationForest:
+    """IsolationForest scoring on a FlatForest whose leaf values are path lengths.
+
+    Each leaf holds depth + c(n_samples), so the forest's mean prediction is
+    the mean path length and score_samples = -2 ** (-mean / c(max_samples)).
+    """
+
+    def __init__(self, forest, average_path, offset):
+        self.forest = forest
+        self.average_path = float(average_path)
+        self.offset = float(offset)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        forest = FlatForest._flatten(
+            model, scaler, lambda tree, depth: depth + average_path_length(tree.n_node_samples))
+        return cls(forest, average_path_length([model.max_samples_])[0], model.offset_)
+
+    def score_samples(self, X):
+        """Same as sklearn's score_samples: lower is more anomalous."""
+        if not self.average_path:
+            return -np.ones(len(X))
+        return -np.power(2.0, -self.forest.predict(X) / self.average_path)
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        """-1 for anomalies, 1 for inliers."""
+        return self.score(X)[0]
+
+    def score(self, X):
+        """(predict, decision_function) from a single pass over the forest."""
+        decision = self.decision_function(X)
+        return np.where(decision < 0, -1, 1), decision
+
+    def to_arrays(self):
+        arrays, meta = self.forest.to_arrays()
+        return arrays, dict(meta, average_path=self.average_path, offset=self.offset)
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        bundle.require(ISOLATION_SCHEMA, ARRAYS)
+        meta = bundle.meta
+        return cls(FlatForest.from_arrays(bundle.arrays, meta), meta["average_path"], meta["offset"])
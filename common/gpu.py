@@ -0,0 +1,159 @@
+"""Pluggable GPU telemetry.
+
+The NVML backend initialises the library once and keeps the device handles
+for the life of the process, so a reading costs a few in-process calls
+instead of forking nvidia-smi. GPUTelemetry caches the last reading for one
+sampling tick, and the fake backend lets every tool run on GPU-less hosts.
+
+The backend is chosen with AIOS_GPU_BACKEND=auto|nvml|fake|none (default
+auto: NVML when available, otherwise no GPUs).
+"""
+import math
+import os
+import time
+from collections import namedtuple
+
+GPUStat = namedtuple("GPUStat", ["index", "name", "load", "memory_used", "memory_total", "processes"])
+GPUStat.__doc__ = "One GPU reading: load in %, memory in bytes, processes as {pid: bytes}."
+
+
+class NullBackend:
+    """No GPUs."""
+
+    name = "none"
+
+    def read(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class NVMLBackend:
+    """Reads every device through one persistent NVML session."""
+
+    name = "nvml"
+
+    def __init__(self):
+        import pynvml
+        self.nvml = pynvml
+        pynvml.nvmlInit()
+        self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+        self.names = []
+        for handle in self.handles:
+            name = pynvml.nvmlDeviceGetName(handle)
+            self.names.append(name.decode() if isinstance(name, bytes) else name)
+
+    def _processes(self, handle):
+        procs = {}
+        for query in (self.nvml.nvmlDeviceGetComputeRunningProcesses,
+                      self.nvml.nvmlDeviceGetGraphicsRunningProcesses):
+            try:
+                for proc in query(handle):
+                    procs[proc.pid] = procs.get(proc.pid, 0) + (proc.usedGpuMemory or 0)
+            except self.nvml.NVMLError:
+                continue
+        return procs
+
+    def read(self):
+        stats = []
+        for i, handle in enumerate(self.handles):
+            try:
+                util = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+                mem = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+            except self.nvml.NVMLError:
+                continue
+            stats.append(GPUStat(i, self.names[i], float(util.gpu), mem.used, mem.total, self._processes(handle)))
+        return stats
+
+    def close(self):
+        self.nvml.nvmlShutdown()
+
+
+class FakeBackend:
+    """In-memory GPUs with slowly varying synthetic load, or pinned values."""
+
+    name = "fake"
+
+    def __init__(self, count=1, memory_total=16 * 1024 ** 3, name="Fake GPU"):
+        self.count = count
+        self.memory_total = memory_total
+        self.gpu_name = name
+        self.overrides = {}
+
+    def set(self, index, load=None, memory_used=None, processes=None):
+        """Pin the reading of one fake GPU (None keeps the synthetic value)."""
+        self.overrides[index] = {"load": load, "memory_used": memory_used, "processes": processes}
+
+    def read(self):
+        now = time.time()
+        stats = []
+        for i in range(self.count):
+            load = 50.0 + 45.0 * math.sin(now / 30.0 + i)
+            used = int(self.memory_total * (0.3 + 0.2 * math.sin(now / 120.0 + i)))
+            procs = {}
+            pinned = self.overrides.get(i, {})
+            if pinned.get("load") is not None:
+                load = pinned["load"]
+            if pinned.get("memory_used") is not None:
+                used = pinned["memory_used"]
+            if pinned.get("processes") is not None:
+                procs = dict(pinned["processes"])
+            stats.append(GPUStat(i, f"{self.gpu_name} {i}", load, used, self.memory_total, procs))
+        return stats
+
+    def close(self):
+        pass
+
+
+def open_backend(name=None):
+    name = name or os.environ.get("AIOS_GPU_BACKEND", "auto")
+    if name == "fake":
+        return FakeBackend(count=int(os.environ.get("AIOS_FAKE_GPUS", "1")))
+    if name == "none":
+        return NullBackend()
+    try:
+        return NVMLBackend()
+    except Exception:
+        if name == "nvml":
+            raise
+        return NullBackend()
+
+
+class GPUTelemetry:
+    """Caches one backend reading for `ttl` seconds (one sampling tick)."""
+
+    def __init__(self, backend=None, ttl=1.0):
+        self.backend = backend if backend is not None else open_backend()
+        self.ttl = ttl
+        self._stats = None
+        self._read_at = 0.0
+
+    def read(self):
+        now = time.monotonic()
+        if self._stats is None or now - self._read_at >= self.ttl:
+            self._stats = self.backend.read()
+            self._read_at = now
+        return self._stats
+
+    def process_memory(self):
+        """GPU memory per pid, summed over all devices."""
+        procs = {}
+        for stat in self.read():
+            for pid, used in stat.processes.items():
+                procs[pid] = procs.get(pid, 0) + used
+        return procs
+
+    def close(self):
+        self.backend.close()
+
+
+_telemetry = None
+
+
+def telemetry():
+    """Process-wide GPUTelemetry, opened on first use."""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = GPUTelemetry()
+    return _telemetry
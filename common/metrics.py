@@ -0,0 +1,115 @@
+"""Prometheus text exposition and the snapshot files it is built from.
+
+The anomaly detector and the scheduler publish their latest results as
+small JSON snapshots under AIOS_STATE_DIR; the dashboard folds them into a
+pre-rendered exposition once per sampling tick, so a scrape only returns
+bytes that already exist. Per-process series are capped at TOP_N rows.
+
+The default directory is per user ($XDG_RUNTIME_DIR/aios, or
+/tmp/aios-<uid>); to let a dashboard read snapshots from daemons running as
+another user (e.g. root), point both at the same AIOS_STATE_DIR. Snapshots
+are written world-readable.
+"""
+import json
+import math
+import os
+import sys
+import tempfile
+
+STATE_DIR = os.environ.get("AIOS_STATE_DIR") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "aios") if os.environ.get("XDG_RUNTIME_DIR")
+    else os.path.join(tempfile.gettempdir(), f"aios-{os.getuid()}"))
+TOP_N = int(os.environ.get("AIOS_METRICS_TOP_N", "20"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+_publish_failed = set()
+
+
+def publish(name, payload):
+    """Atomically replace the snapshot `name` with a JSON payload.
+
+    Failures are reported once per snapshot and otherwise ignored, so an
+    unwritable state directory never stops the tool that publishes.
+    """
+    tmp = None
+    try:
+        os.makedirs(STATE_DIR, mode=0o755, exist_ok=True)
+        path = os.path.join(STATE_DIR, name + ".json")
+        fd, tmp = tempfile.mkstemp(dir=STATE_DIR, prefix="." + name)
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+        # mkstemp creates 0600; a dashboard running as another user must be able to read it
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError as e:
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+        if name not in _publish_failed:
+            _publish_failed.add(name)
+            print(f"Cannot publish {name} metrics to {STATE_DIR}: {e}", file=sys.stderr)
+        return
+    _publish_failed.discard(name)
+
+
+_loaded = {}
+
+
+def load(name):
+    """Latest snapshot `name`, re-read only when the file changes."""
+    path = os.path.join(STATE_DIR, name + ".json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _loaded.get(name)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                cached = (mtime, json.load(f))
+        except (OSError, ValueError):
+            return cached[1] if cached else None
+        _loaded[name] = cached
+    return cached[1]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if not value.is_integer() else str(int(value))
+
+
+class Exposition:
+    """Accumulates metric families and renders the Prometheus text format."""
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, name, help_text, kind, samples):
+        """Add a family; samples are (labels dict, value) pairs or a bare value."""
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if labels:
+                rendered = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                self.lines.append(f"{name}{{{rendered}}} {_number(value)}")
+            else:
+                self.lines.append(f"{name} {_number(value)}")
+
+    def render(self):
+        return ("\n".join(self.lines) + "\n").encode()
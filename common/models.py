@@ -0,0 +1,230 @@
+"""Versioned model registry.
+
+A model version is a directory <AIOS_MODEL_DIR>/<name>/<version>/ holding
+one .npy file per array and a manifest.json with the schema, free-form
+metadata and the dtype, shape and SHA-256 of every array. Arrays are
+memory-mapped on load, so opening a bundle costs a few page faults rather
+than an unpickle, and nothing is read until a model is first used.
+Versions are written to a temporary directory and renamed into place, so a
+running daemon never sees a half-written one.
+
+Convert the legacy pickles with
+    python3 -m common.models import-pickle scheduler scheduler/bin/process-scheduler.pkl
+    python3 -m common.models import-pickle anomaly anomaly/bin/anomaly-detector.pkl
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+MODEL_DIR = os.environ.get(
+    "AIOS_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models"))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def versions(name, root=None):
+    """Complete versions of a model, oldest first."""
+    path = os.path.join(root or MODEL_DIR, name)
+    try:
+        entries = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    return sorted(int(v) for v in entries
+                  if v.isdigit() and os.path.exists(os.path.join(path, v, "manifest.json")))
+
+
+def latest_version(name, root=None):
+    found = versions(name, root)
+    return found[-1] if found else None
+
+
+def save_bundle(name, schema, arrays, meta=None, root=None):
+    """Write arrays as the next version of `name`; returns the version number."""
+    base = os.path.join(root or MODEL_DIR, name)
+    os.makedirs(base, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=base, prefix=".new-")
+    try:
+        manifest = {"name": name, "schema": schema, "created": time.time(), "meta": meta or {}, "arrays": {}}
+        for key, value in arrays.items():
+            value = np.ascontiguousarray(value)
+            path = os.path.join(tmp, key + ".npy")
+            np.save(path, value)
+            manifest["arrays"][key] = {"dtype": value.dtype.str, "shape": list(value.shape),
+                                       "sha256": _sha256(path)}
+        while True:
+            version = (latest_version(name, root) or 0) + 1
+            manifest["version"] = version
+            with open(os.path.join(tmp, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=1)
+            try:
+                os.rename(tmp, os.path.join(base, str(version)))
+                return version
+            except OSError:
+                # another writer took this version number first
+                if not os.path.exists(os.path.join(base, str(version))):
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+class Bundle:
+    """One loaded model version: manifest metadata plus memory-mapped arrays."""
+
+    def __init__(self, name, version, schema, meta, arrays, load_seconds):
+        self.name = name
+        self.version = version
+        self.schema = schema
+        self.meta = meta
+        self.arrays = arrays
+        self.load_seconds = load_seconds
+
+    def require(self, schema, names):
+        """Raise ValueError unless the bundle has this schema and these arrays."""
+        if self.schema != schema:
+            raise ValueError(f"{self.name} v{self.version}: schema {self.schema!r}, expected {schema!r}")
+        missing = [name for name in names if name not in self.arrays]
+        if missing:
+            raise ValueError(f"{self.name} v{self.version}: missing arrays {', '.join(missing)}")
+
+
+def load_bundle(name, version=None, root=None, verify=True):
+    """Memory-map a model version (the latest by default), checking it against its manifest."""
+    start = time.perf_counter()
+    version = version if version is not None else latest_version(name, root)
+    if version is None:
+        raise FileNotFoundError(f"no versions of model {name!r} under {root or MODEL_DIR}")
+    path = os.path.join(root or MODEL_DIR, name, str(version))
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    arrays = {}
+    for key, spec in manifest["arrays"].items():
+        file = os.path.join(path, key + ".npy")
+        if verify and _sha256(file) != spec["sha256"]:
+            raise ValueError(f"{name} v{version}: {key}.npy does not match its manifest hash")
+        array = np.load(file, mmap_mode="r")
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(f"{name} v{version}: {key}.npy has dtype {array.dtype.str} shape {array.shape}, "
+                             f"expected {spec['dtype']} {tuple(spec['shape'])}")
+        arrays[key] = array
+    return Bundle(name, version, manifest["schema"], manifest["meta"], arrays, time.perf_counter() - start)
+
+
+class ModelHandle:
+    """Lazily loaded model that hot-swaps to newer versions as they appear.
+
+    `build` turns a Bundle into the model object. get() loads the newest
+    version that passes validation on first use and, at most every
+    `check_interval` seconds, swaps in a newer version; a version that fails
+    validation is reported once and the current model is kept.
+    """
+
+    def __init__(self, name, build, root=None, check_interval=10.0):
+        self.name = name
+        self.build = build
+        self.root = root
+        self.check_interval = check_interval
+        self.model = None
+        self.version = None
+        self.load_seconds = None
+        self.checked_at = 0.0
+        self.rejected = set()
+
+    def _load(self, version):
+        bundle = load_bundle(self.name, version, self.root)
+        start = time.perf_counter()
+        model = self.build(bundle)
+        self.model = model
+        self.version = bundle.version
+        self.load_seconds = bundle.load_seconds + time.perf_counter() - start
+
+    def _cold_start(self):
+        found = versions(self.name, self.root)
+        if not found:
+            raise FileNotFoundError(f"no versions of model {self.name!r} under {self.root or MODEL_DIR}")
+        for version in reversed(found):
+            try:
+                self._load(version)
+                return
+            except (OSError, ValueError, KeyError) as e:
+                self.rejected.add(version)
+                print(f"Skipping {self.name} model v{version}: {e}", file=sys.stderr)
+        raise ValueError(f"no version of model {self.name!r} passes validation")
+
+    def get(self):
+        now = time.monotonic()
+        if self.model is None:
+            self._cold_start()
+            self.checked_at = now
+        elif now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            version = latest_version(self.name, self.root)
+            if version is not None and version != self.version and version not in self.rejected:
+                try:
+                    self._load(version)
+                    print(f"Loaded {self.name} model v{version} in {self.load_seconds * 1000:.1f} ms", file=sys.stderr)
+                except (OSError, ValueError, KeyError) as e:
+                    self.rejected.add(version)
+                    print(f"Keeping {self.name} model v{self.version}: {e}", file=sys.stderr)
+        return self.model
+
+    def info(self):
+        """Version and load time, for status output and /metrics."""
+        return {"version": self.version,
+                "load_ms": None if self.load_seconds is None else round(self.load_seconds * 1000, 3)}
+
+
+def import_pickle(name, path, root=None):
+    """Convert a legacy {'model', 'scaler'} pickle into a new version of `name`."""
+    import pickle
+
+    from common.forest import ISOLATION_SCHEMA, SCHEMA, FlatForest, FlatIsolationForest
+
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    model = state["model"]
+    if hasattr(model, "offset_"):
+        schema, flat = ISOLATION_SCHEMA, FlatIsolationForest.from_sklearn(model, state.get("scaler"))
+    else:
+        schema, flat = SCHEMA, FlatForest.from_sklearn(model, state.get("scaler"))
+    arrays, meta = flat.to_arrays()
+    meta["features"] = [str(f) for f in getattr(state.get("scaler"), "feature_names_in_", [])]
+    meta["source"] = os.path.basename(path)
+    return save_bundle(name, schema, arrays, meta, root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned model bundles.")
+    parser.add_argument("--root", default=None, help=f"Registry directory (default: {MODEL_DIR})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("import-pickle", help="Convert a sklearn pickle into a new version")
+    convert.add_argument("name", help="Model name, e.g. scheduler or anomaly")
+    convert.add_argument("pickle", help="Pickle holding {'model': ..., 'scaler': ...}")
+    listing = subparsers.add_parser("list", help="Show the versions of a model")
+    listing.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command == "import-pickle":
+        version = import_pickle(args.name, args.pickle, args.root)
+        print(f"Wrote {args.name} v{version}")
+    else:
+        for version in versions(args.name, args.root):
+            bundle = load_bundle(args.name, version, args.root)
+            print(f"v{version}\t{bundle.schema}\t{len(bundle.arrays)} arrays\tloaded in {bundle.load_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Single-pass /proc sampler shared by every tool.
+
+Each call to Sampler.sample() reads /proc/<pid>/stat and /proc/<pid>/io once
+per process and returns a columnar Snapshot (NumPy arrays sorted by pid).
+Rates are computed against the previous snapshot, matching processes on
+(pid, start time) so a recycled pid never inherits another process' counters.
+"""
+import os
+import time
+
+import numpy as np
+import psutil
+
+from common import gpu as gpu_telemetry
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Offsets into /proc/<pid>/stat after the ")" that closes the comm field
+_PPID, _UTIME, _STIME, _THREADS, _STARTTIME, _VSIZE, _RSS = 1, 11, 12, 17, 19, 20, 21
+
+COLUMNS = ["pid", "start_time", "ppid", "cpu_ticks", "rss", "vms",
+           "num_threads", "read_bytes", "write_bytes"]
+
+SECTOR_SIZE = 512
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def boot_time(proc_root="/proc"):
+    """Boot time in seconds since the epoch, read from <proc_root>/stat."""
+    for line in _read(os.path.join(proc_root, "stat")).splitlines():
+        if line.startswith(b"btime"):
+            return float(line.split()[1])
+    return psutil.boot_time()
+
+
+def read_processes(proc_root="/proc", io=True):
+    """Read stat (and io) of every process once; returns (names, int64 matrix)."""
+    pids = sorted(int(d) for d in os.listdir(proc_root) if d.isdigit())
+    names = []
+    rows = []
+    for pid in pids:
+        base = os.path.join(proc_root, str(pid))
+        try:
+            stat = _read(base + "/stat")
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+        lpar, rpar = stat.find(b"("), stat.rfind(b")")
+        fields = stat[rpar + 2:].split()
+        read_bytes = write_bytes = -1
+        if io:
+            try:
+                for line in _read(base + "/io").splitlines():
+                    if line.startswith(b"read_bytes"):
+                        read_bytes = int(line[11:])
+                    elif line.startswith(b"write_bytes"):
+                        write_bytes = int(line[12:])
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                pass
+        names.append(stat[lpar + 1:rpar].decode("utf-8", "replace"))
+        rows.append((
+            pid,
+            int(fields[_STARTTIME]),
+            int(fields[_PPID]),
+            int(fields[_UTIME]) + int(fields[_STIME]),
+            int(fields[_RSS]) * PAGE_SIZE,
+            int(fields[_VSIZE]),
+            int(fields[_THREADS]),
+            read_bytes,
+            write_bytes,
+        ))
+    table = np.array(rows, dtype=np.int64).reshape(len(rows), len(COLUMNS))
+    return np.array(names, dtype=object), table
+
+
+class Counters:
+    """Named rows of cumulative counters (one row per core or device)."""
+
+    def __init__(self, names, values):
+        self.names = names
+        self.values = values
+
+    def deltas(self, prev):
+        """Per-row counter increase since `prev`, aligned by name (0 for new rows)."""
+        if prev is None:
+            return np.zeros_like(self.values, dtype=np.float64)
+        if self.names == prev.names:
+            delta = self.values - prev.values
+        else:
+            index = {name: i for i, name in enumerate(prev.names)}
+            idx = np.array([index.get(name, -1) for name in self.names], dtype=np.intp)
+            found = (idx >= 0)[:, None]
+            delta = np.where(found, self.values - prev.values[np.maximum(idx, 0)], 0)
+        return np.clip(delta, 0, None).astype(np.float64)
+
+
+def read_cpu_times(proc_root="/proc"):
+    """Per-core jiffies as (busy, total) columns, from <proc_root>/stat."""
+    names, rows = [], []
+    for line in _read(os.path.join(proc_root, "stat")).splitlines():
+        if not line.startswith(b"cpu") or line.startswith(b"cpu "):
+            continue
+        fields = line.split()
+        # user nice system idle iowait irq softirq steal (guest time is already in user)
+        times = [int(v) for v in fields[1:9]]
+        total = sum(times)
+        names.append(fields[0].decode())
+        rows.append((total - times[3] - times[4], total))
+    return Counters(names, np.array(rows, dtype=np.int64).reshape(len(rows), 2))
+
+
+def read_net_dev(proc_root="/proc"):
+    """Per-interface rx/tx bytes and packets, from <proc_root>/net/dev."""
+    names, rows = [], []
+    for line in _read(os.path.join(proc_root, "net", "dev")).splitlines()[2:]:
+        name, _, data = line.partition(b":")
+        fields = data.split()
+        names.append(name.strip().decode())
+        rows.append((int(fields[0]), int(fields[8]), int(fields[1]), int(fields[9])))
+    return Counters(names, np.array(rows, dtype=np.int64).reshape(len(rows), 4))
+
+
+def _whole_disks(sys_root):
+    try:
+        return set(os.listdir(os.path.join(sys_root, "block")))
+    except FileNotFoundError:
+        return None
+
+
+def read_diskstats(proc_root="/proc", sys_root=None):
+    """Per-device reads, read bytes, writes, written bytes and busy ms.
+
+    Only whole block devices are kept (partitions would double count), and
+    loop/ram devices are skipped. sys_root defaults to the "sys" directory
+    next to proc_root.
+    """
+    if sys_root is None:
+        sys_root = os.path.join(os.path.dirname(os.path.normpath(proc_root)), "sys")
+    whole = _whole_disks(sys_root)
+    names, rows = [], []
+    for line in _read(os.path.join(proc_root, "diskstats")).splitlines():
+        fields = line.split()
+        name = fields[2].decode()
+        if name.startswith(("loop", "ram")) or (whole is not None and name.replace("/", "!") not in whole):
+            continue
+        names.append(name)
+        rows.append((int(fields[3]), int(fields[5]) * SECTOR_SIZE,
+                     int(fields[7]), int(fields[9]) * SECTOR_SIZE, int(fields[12])))
+    return Counters(names, np.array(rows, dtype=np.int64).reshape(len(rows), 5))
+
+
+def read_host(gpu=False, proc_root="/proc"):
+    """Host-wide counters, taken once per tick alongside the process table."""
+    return {
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "cpu_count": psutil.cpu_count(logical=True),
+        "cpu_freq": psutil.cpu_freq(),
+        "memory": psutil.virtual_memory(),
+        "disk": psutil.disk_usage("/"),
+        "network": psutil.net_io_counters(),
+        "gpu": gpu_telemetry.telemetry().read() if gpu else [],
+        "cpu_times": read_cpu_times(proc_root),
+        "net_dev": read_net_dev(proc_root),
+        "diskstats": read_diskstats(proc_root),
+    }
+
+
+class Snapshot:
+    """Columnar view of all processes (sorted by pid) at one instant."""
+
+    def __init__(self, timestamp, monotonic, names, table, host, boot):
+        self.timestamp = timestamp
+        self.monotonic = monotonic
+        self.host = host
+        self.boot_time = boot
+        self.name = names
+        for i, col in enumerate(COLUMNS):
+            setattr(self, col, table[:, i])
+        self.io_ok = (self.read_bytes >= 0) & (self.write_bytes >= 0)
+        n = len(names)
+        self.interval = 0.0
+        self.is_new = np.ones(n, dtype=bool)
+        self.cpu_percent = np.zeros(n)
+        self.read_rate = np.where(self.io_ok, 0.0, np.nan)
+        self.write_rate = np.where(self.io_ok, 0.0, np.nan)
+        self.core_percent = np.zeros(len(host["cpu_times"].names))
+        # rx bytes/s, tx bytes/s, rx packets/s, tx packets/s per interface
+        self.net_rates = np.zeros((len(host["net_dev"].names), 4))
+        # read bytes/s, write bytes/s, read IOPS, write IOPS, busy % per device
+        self.disk_rates = np.zeros((len(host["diskstats"].names), 5))
+
+    def __len__(self):
+        return len(self.name)
+
+    @property
+    def create_time(self):
+        return self.boot_time + self.start_time / CLK_TCK
+
+    @property
+    def nics(self):
+        return self.host["net_dev"].names
+
+    @property
+    def disks(self):
+        return self.host["diskstats"].names
+
+    @property
+    def cores(self):
+        return self.host["cpu_times"].names
+
+    def diff(self, prev):
+        """Fill the rate columns from the counters of an earlier snapshot."""
+        dt = self.monotonic - prev.monotonic
+        if dt <= 0:
+            return
+        self._diff_host(prev, dt)
+        if not len(prev) or not len(self):
+            return
+        idx = np.minimum(np.searchsorted(prev.pid, self.pid), len(prev) - 1)
+        matched = (prev.pid[idx] == self.pid) & (prev.start_time[idx] == self.start_time)
+        self.interval = dt
+        self.is_new = ~matched
+        self.cpu_percent = np.where(
+            matched, (self.cpu_ticks - prev.cpu_ticks[idx]) / CLK_TCK / dt * 100.0, 0.0)
+        both_io = matched & self.io_ok & prev.io_ok[idx]
+        for col, rate in (("read_bytes", "read_rate"), ("write_bytes", "write_rate")):
+            delta = np.clip(getattr(self, col) - getattr(prev, col)[idx], 0, None) / dt
+            setattr(self, rate, np.where(both_io, delta, getattr(self, rate)))
+
+    def _diff_host(self, prev, dt):
+        cpu = self.host["cpu_times"].deltas(prev.host["cpu_times"])
+        self.core_percent = np.divide(cpu[:, 0] * 100.0, cpu[:, 1],
+                                      out=np.zeros(len(cpu)), where=cpu[:, 1] > 0)
+        self.net_rates = self.host["net_dev"].deltas(prev.host["net_dev"]) / dt
+        disk = self.host["diskstats"].deltas(prev.host["diskstats"])
+        self.disk_rates = np.column_stack((
+            disk[:, 1] / dt, disk[:, 3] / dt, disk[:, 0] / dt, disk[:, 2] / dt,
+            np.minimum(disk[:, 4] / (dt * 10.0), 100.0),
+        ))
+
+    def top(self, n, by="cpu_percent"):
+        """Indices of the n largest rows by the given column."""
+        values = getattr(self, by)
+        n = min(n, len(values))
+        if n <= 0:
+            return np.empty(0, dtype=np.intp)
+        idx = np.argpartition(-values, n - 1)[:n]
+        return idx[np.argsort(-values[idx])]
+
+    def to_frame(self):
+        """Per-process pandas DataFrame indexed by pid."""
+        import pandas as pd
+        return pd.DataFrame({
+            "name": self.name,
+            "create_time": self.create_time,
+            "ppid": self.ppid,
+            "cpu_percent": self.cpu_percent,
+            "rss": self.rss,
+            "vms": self.vms,
+            "num_threads": self.num_threads,
+            "read_bytes": np.where(self.io_ok, self.read_bytes, np.nan),
+            "write_bytes": np.where(self.io_ok, self.write_bytes, np.nan),
+            "read_rate": self.read_rate,
+            "write_rate": self.write_rate,
+            "is_new": self.is_new,
+        }, index=pd.Index(self.pid, name="pid"))
+
+
+class Sampler:
+    """Takes snapshots and keeps the previous one to derive rates."""
+
+    def __init__(self, proc_root="/proc", processes=True, io=True, gpu=False):
+        self.proc_root = proc_root
+        self.processes = processes
+        self.io = io
+        self.gpu = gpu
+        self.boot_time = boot_time(proc_root)
+        self.last = None
+
+    def sample(self):
+        host = read_host(self.gpu, self.proc_root)
+        if self.processes:
+            names, table = read_processes(self.proc_root, self.io)
+        else:
+            names, table = np.empty(0, dtype=object), np.empty((0, len(COLUMNS)), dtype=np.int64)
+        snap = Snapshot(time.time(), time.monotonic(), names, table, host, self.boot_time)
+        if self.last is not None:
+            snap.diff(self.last)
+        self.last = snap
+        return snap
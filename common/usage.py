@@ -0,0 +1,95 @@
+"""Append-only history of ML process usage samples, kept in SQLite.
+
+ai-monitor.py logs one row per ML process per loop. Rows are buffered in
+memory and written in a single transaction per flush, so logging costs the
+same however long the history grows. Every row carries its UTC day, which
+leads the table's index: training reads only the columns they need over
+the recent days they ask for, and retention drops whole days at once.
+"""
+import os
+import sqlite3
+import time
+
+DB_PATH = os.environ.get(
+    "AIOS_USAGE_DB", os.path.join(os.path.expanduser("~"), ".local", "share", "aios", "ai-usage.db"))
+LEGACY_CSV = os.path.join(os.path.expanduser("~"), "ai_usage_history.csv")
+
+COLUMNS = ["timestamp", "cpu_usage", "memory_usage", "gpu_usage", "disk_io", "network_io", "ml_framework", "runtime"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    day INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    cpu_usage REAL,
+    memory_usage REAL,
+    gpu_usage REAL,
+    disk_io REAL,
+    network_io REAL,
+    ml_framework TEXT,
+    runtime REAL
+);
+CREATE INDEX IF NOT EXISTS usage_day ON usage (day, timestamp);
+"""
+
+
+def day_of(timestamp):
+    return int(timestamp // 86400)
+
+
+class UsageStore:
+    """Buffers usage rows and appends them to SQLite in batches."""
+
+    def __init__(self, path=DB_PATH, retention_days=None, batch=500):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.retention_days = retention_days
+        self.batch = batch
+        self.pending = []
+
+    def append(self, row):
+        """Queue one row (a dict keyed by COLUMNS); flushed once `batch` rows are pending."""
+        self.pending.append([day_of(row["timestamp"])] + [row.get(c) for c in COLUMNS])
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write every pending row in one transaction and drop days past retention."""
+        with self.db:
+            if self.pending:
+                self.db.executemany(
+                    f"INSERT INTO usage (day, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                    self.pending)
+                self.pending = []
+            if self.retention_days:
+                self.db.execute("DELETE FROM usage WHERE day < ?", (day_of(time.time()) - self.retention_days,))
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+
+    def read(self, columns=COLUMNS, days=None):
+        """DataFrame of only `columns`, over the last `days` days (all of it when None)."""
+        import pandas as pd
+        sql = f"SELECT {', '.join(columns)} FROM usage"
+        params = []
+        if days is not None:
+            sql += " WHERE day >= ?"
+            params.append(day_of(time.time()) - days + 1)
+        return pd.DataFrame.from_records(self.db.execute(sql, params).fetchall(), columns=list(columns))
+
+    def import_csv(self, path=LEGACY_CSV):
+        """Append the rows of an old ai_usage_history.csv; returns how many."""
+        import pandas as pd
+        legacy = pd.read_csv(path)
+        legacy = legacy[[c for c in COLUMNS if c in legacy.columns]].dropna(subset=["timestamp"])
+        for row in legacy.to_dict("records"):
+            self.pending.append([day_of(row["timestamp"])] + [row.get(c) for c in COLUMNS])
+        self.flush()
+        return len(legacy)
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import psutil
-import GPUtil
-from datetime import datetime
-import csv
-import matplotlib.pyplot as plt
-import io
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common import metrics
+from common.cgroups import CgroupSampler, unified_root
+from common.sampler import Sampler
+from history import History
+import export
+import plotting
 
 app = FastAPI()
 
@@ -20,35 +28,57 @@ app.add_middleware(
 )
 
 # Store resource history
-resource_history = []
+resource_history = History()
+
+sampler = Sampler(gpu=True)
+
+# Per-container/service usage from leaf cgroups (cgroup v2), when the host has it (DASHBOARD_CGROUPS=0 disables)
+cgroup_sampler = None
+if os.environ.get("DASHBOARD_CGROUPS", "1") != "0" and unified_root():
+    cgroup_sampler = CgroupSampler()
+
+# Seconds between background samples, shared by every connected client
+SAMPLE_INTERVAL = float(os.environ.get("DASHBOARD_INTERVAL", "2.0"))
 
-def get_gpu_usage():
-    gpus = GPUtil.getGPUs()
+latest_sample = None
+subscribers = set()
+
+# Prometheus exposition, rebuilt once per sample so scrapes never sample
+metrics_payload = b""
+
+# Rendered PNGs keyed on (history version, request parameters)
+PLOT_CACHE_SIZE = 8
+plot_cache = {}
+plot_pool = None
+
+def get_gpu_usage(snap):
     return [
         {
-            "id": gpu.id,
+            "id": gpu.index,
             "name": gpu.name,
-            "memoryUsed": gpu.memoryUsed * 1024 * 1024,
-            "memoryTotal": gpu.memoryTotal * 1024 * 1024,
-            "load": gpu.load * 100,  # This will be the GPU usage percentage
-        } for gpu in gpus
-    ] if gpus else []
+            "memoryUsed": gpu.memory_used,
+            "memoryTotal": gpu.memory_total,
+            "load": gpu.load,  # This will be the GPU usage percentage
+        } for gpu in snap.host["gpu"]
+    ]
 
-@app.get("/api/resources")
-def get_resources():
+def sample_resources():
     # Collect resource data
-    cpu_usage = psutil.cpu_percent()
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-    network = psutil.net_io_counters()
+    snap = sampler.sample()
+    cpu_usage = snap.host["cpu_percent"]
+    memory = snap.host["memory"]
+    disk = snap.host["disk"]
+    network = snap.host["network"]
 
-    gpu_data = get_gpu_usage()
+    gpu_data = get_gpu_usage(snap)
+    cgroups = cgroup_sampler.sample() if cgroup_sampler is not None else None
 
     resource_data = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": datetime.fromtimestamp(snap.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
         "cpu": {
             "usage": cpu_usage,
-            "cores": psutil.cpu_count(logical=True)
+            "cores": snap.host["cpu_count"],
+            "per_core": snap.core_percent.round(1).tolist()
         },
         "memory": {
             "used": memory.used,
@@ -58,117 +88,363 @@ def get_resources():
         "disk": {
             "used": disk.used,
             "total": disk.total,
-            "percent": disk.percent
+            "percent": disk.percent,
+            "read_rate": float(snap.disk_rates[:, 0].sum()),
+            "write_rate": float(snap.disk_rates[:, 1].sum()),
+            "devices": [
+                {
+                    "name": name,
+                    "read_rate": row[0],
+                    "write_rate": row[1],
+                    "read_iops": row[2],
+                    "write_iops": row[3],
+                    "busy": row[4]
+                } for name, row in zip(snap.disks, snap.disk_rates.tolist())
+            ]
         },
         "network": {
             "sent": network.bytes_sent,
-            "recv": network.bytes_recv
+            "recv": network.bytes_recv,
+            "sent_rate": float(snap.net_rates[:, 1].sum()),
+            "recv_rate": float(snap.net_rates[:, 0].sum()),
+            "interfaces": [
+                {
+                    "name": name,
+                    "recv_rate": row[0],
+                    "sent_rate": row[1],
+                    "recv_packets": row[2],
+                    "sent_packets": row[3]
+                } for name, row in zip(snap.nics, snap.net_rates.tolist())
+            ]
         },
-        "gpu": gpu_data
+        "gpu": gpu_data,
+        "processes": {
+            "count": len(snap),
+            "top": [
+                {
+                    "pid": int(snap.pid[i]),
+                    "name": snap.name[i],
+                    "cpu": float(snap.cpu_percent[i]),
+                    "rss": int(snap.rss[i])
+                } for i in snap.top(5)
+            ]
+        }
     }
+    if cgroups is not None:
+        resource_data["cgroups"] = {
+            "count": len(cgroups),
+            "top": [
+                {
+                    "path": cgroups.path[i],
+                    "name": cgroups.name[i],
+                    "cpu": float(cgroups.cpu_percent[i]),
+                    "memory": int(cgroups.memory[i]) if cgroups.memory[i] >= 0 else None,
+                    "read_rate": float(cgroups.read_rate[i]),
+                    "write_rate": float(cgroups.write_rate[i]),
+                    "pids": int(cgroups.pids[i]) if cgroups.pids[i] >= 0 else None
+                } for i in cgroups.top(5)
+            ]
+        }
 
     # Store the resource data in history
-    resource_history.append(resource_data)
+    resource_history.append(snap.timestamp, flatten(resource_data), {
+        "gpu": ", ".join([gpu['name'] for gpu in gpu_data]) if gpu_data else "No GPU"
+    })
+    global metrics_payload
+    metrics_payload = build_metrics(snap, cgroups)
     return resource_data
 
+def build_metrics(snap, cgroups=None):
+    """Render host, top-N process and cgroup, anomaly and scheduler series for /metrics."""
+    host = snap.host
+    out = metrics.Exposition()
+    out.add("aios_cpu_usage_percent", "Host CPU utilization.", "gauge", host["cpu_percent"])
+    out.add("aios_cpu_cores", "Logical CPU cores.", "gauge", host["cpu_count"])
+    out.add("aios_memory_used_bytes", "Host memory in use.", "gauge", host["memory"].used)
+    out.add("aios_memory_total_bytes", "Host memory installed.", "gauge", host["memory"].total)
+    out.add("aios_disk_used_bytes", "Used bytes on /.", "gauge", host["disk"].used)
+    out.add("aios_disk_total_bytes", "Size of /.", "gauge", host["disk"].total)
+    out.add("aios_network_sent_bytes_total", "Bytes sent on all interfaces.", "counter", host["network"].bytes_sent)
+    out.add("aios_network_received_bytes_total", "Bytes received on all interfaces.", "counter", host["network"].bytes_recv)
+    out.add("aios_cpu_core_usage_percent", "Per-core CPU utilization.", "gauge",
+            [({"core": core}, value) for core, value in zip(snap.cores, snap.core_percent)])
+    nics = [{"interface": name} for name in snap.nics]
+    out.add("aios_network_receive_bytes_per_second", "Receive rate per interface.", "gauge",
+            list(zip(nics, snap.net_rates[:, 0])))
+    out.add("aios_network_transmit_bytes_per_second", "Transmit rate per interface.", "gauge",
+            list(zip(nics, snap.net_rates[:, 1])))
+    disks = [{"device": name} for name in snap.disks]
+    out.add("aios_disk_read_bytes_per_second", "Read rate per block device.", "gauge",
+            list(zip(disks, snap.disk_rates[:, 0])))
+    out.add("aios_disk_write_bytes_per_second", "Write rate per block device.", "gauge",
+            list(zip(disks, snap.disk_rates[:, 1])))
+    out.add("aios_disk_busy_percent", "Share of time each block device was busy.", "gauge",
+            list(zip(disks, snap.disk_rates[:, 4])))
+    gpus = host["gpu"]
+    out.add("aios_gpu_load_percent", "GPU utilization.", "gauge",
+            [({"gpu": gpu.index, "name": gpu.name}, gpu.load) for gpu in gpus])
+    out.add("aios_gpu_memory_used_bytes", "GPU memory in use.", "gauge",
+            [({"gpu": gpu.index, "name": gpu.name}, gpu.memory_used) for gpu in gpus])
+    out.add("aios_gpu_memory_total_bytes", "GPU memory installed.", "gauge",
+            [({"gpu": gpu.index, "name": gpu.name}, gpu.memory_total) for gpu in gpus])
+
+    out.add("aios_processes", "Number of processes.", "gauge", len(snap))
+    top = snap.top(metrics.TOP_N)
+    labels = [{"pid": int(snap.pid[i]), "name": snap.name[i]} for i in top]
+    out.add("aios_process_cpu_percent", f"CPU usage of the top {metrics.TOP_N} processes by CPU.", "gauge",
+            [(label, snap.cpu_percent[i]) for label, i in zip(labels, top)])
+    out.add("aios_process_resident_bytes", f"Resident memory of the top {metrics.TOP_N} processes by CPU.", "gauge",
+            [(label, snap.rss[i]) for label, i in zip(labels, top)])
+
+    if cgroups is not None:
+        top = cgroups.top(metrics.TOP_N)
+        labels = [{"cgroup": cgroups.path[i], "name": cgroups.name[i]} for i in top]
+        out.add("aios_cgroups", "Number of leaf cgroups.", "gauge", len(cgroups))
+        out.add("aios_cgroup_cpu_percent", f"CPU usage of the top {metrics.TOP_N} cgroups by CPU.", "gauge",
+                [(label, cgroups.cpu_percent[i]) for label, i in zip(labels, top)])
+        out.add("aios_cgroup_memory_bytes", f"memory.current of the top {metrics.TOP_N} cgroups by CPU.", "gauge",
+                [(label, cgroups.memory[i]) for label, i in zip(labels, top) if cgroups.memory[i] >= 0])
+        out.add("aios_cgroup_read_bytes_per_second", f"Disk read rate of the top {metrics.TOP_N} cgroups by CPU.",
+                "gauge", [(label, cgroups.read_rate[i]) for label, i in zip(labels, top)])
+        out.add("aios_cgroup_write_bytes_per_second", f"Disk write rate of the top {metrics.TOP_N} cgroups by CPU.",
+                "gauge", [(label, cgroups.write_rate[i]) for label, i in zip(labels, top)])
+        out.add("aios_cgroup_pids", f"pids.current of the top {metrics.TOP_N} cgroups by CPU.", "gauge",
+                [(label, cgroups.pids[i]) for label, i in zip(labels, top) if cgroups.pids[i] >= 0])
+
+    anomalies = metrics.load("anomaly")
+    if anomalies:
+        procs = anomalies["processes"][:metrics.TOP_N]
+        out.add("aios_anomaly_last_run_timestamp_seconds", "When the anomaly detector last scored processes.", "gauge",
+                anomalies["timestamp"])
+        out.add("aios_anomalous_processes", "Processes flagged anomalous in the last run.", "gauge",
+                anomalies["anomalous"])
+        # entries are processes, or cgroups when the detector runs with --cgroups
+        labels = [{key: p[key] for key in ("pid", "cgroup", "name") if key in p} for p in procs]
+        out.add("aios_anomaly_score", f"Anomaly score of the {metrics.TOP_N} most anomalous processes or cgroups (lower is more anomalous).",
+                "gauge", [(label, p["score"]) for label, p in zip(labels, procs)])
+        out.add("aios_anomaly_flagged", "1 when the process or cgroup was flagged anomalous.", "gauge",
+                [(label, int(p["anomaly"])) for label, p in zip(labels, procs)])
+
+    schedule = metrics.load("scheduler")
+    if schedule:
+        procs = schedule["processes"][:metrics.TOP_N]
+        out.add("aios_scheduler_last_run_timestamp_seconds", "When the scheduler last predicted burst times.", "gauge",
+                schedule["timestamp"])
+        out.add("aios_predicted_burst_milliseconds", f"Predicted burst time of the {metrics.TOP_N} shortest predicted processes.",
+                "gauge", [({"pid": p["pid"], "name": p["name"]}, p["burst_ms"]) for p in procs])
+        cache = schedule.get("cache")
+        if cache:
+            out.add("aios_scheduler_cache_hits_total", "Burst-time predictions served from the cache.", "counter",
+                    cache["hits"])
+            out.add("aios_scheduler_cache_misses_total", "Burst-time predictions recomputed.", "counter",
+                    cache["misses"])
+            out.add("aios_scheduler_cache_evictions_total", "Cached predictions evicted past the size bound.", "counter",
+                    cache["evictions"])
+            out.add("aios_scheduler_cache_entries", "Cached burst-time predictions.", "gauge", cache["size"])
+            out.add("aios_scheduler_cache_hit_ratio", "Share of lookups served from the cache.", "gauge",
+                    cache["hit_rate"])
+
+    models = [(name, payload["model"]) for name, payload in (("anomaly", anomalies), ("scheduler", schedule))
+              if payload and payload.get("model")]
+    out.add("aios_model_version", "Registry version of the model in use.", "gauge",
+            [({"model": name}, model["version"]) for name, model in models])
+    out.add("aios_model_load_seconds", "Time taken to load and validate the model in use.", "gauge",
+            [({"model": name}, model["load_ms"] / 1000.0) for name, model in models if model["load_ms"] is not None])
+    return out.render()
+
+def publish(resource_data):
+    """Cache the latest sample and fan it out, serialized once, to all streams."""
+    global latest_sample
+    latest_sample = resource_data
+    payload = json.dumps(resource_data)
+    for queue in list(subscribers):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+async def sampler_loop():
+    loop = asyncio.get_event_loop()
+    next_tick = loop.time()
+    while True:
+        try:
+            publish(await loop.run_in_executor(None, sample_resources))
+        except Exception as e:
+            print(f"Sampling failed: {e}")
+        next_tick += SAMPLE_INTERVAL
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+@app.on_event("startup")
+async def start_sampler():
+    global plot_pool
+    plot_pool = ProcessPoolExecutor(max_workers=1)
+    app.state.sampler_task = asyncio.ensure_future(sampler_loop())
+
+@app.on_event("shutdown")
+async def stop_sampler():
+    app.state.sampler_task.cancel()
+    plot_pool.shutdown(wait=False)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics_payload, media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/resources")
+async def get_resources():
+    if latest_sample is None:
+        loop = asyncio.get_event_loop()
+        publish(await loop.run_in_executor(None, sample_resources))
+    return latest_sample
+
+@app.get("/api/stream")
+async def stream_resources():
+    queue = asyncio.Queue(maxsize=1)
+    if latest_sample is not None:
+        queue.put_nowait(json.dumps(latest_sample))
+    subscribers.add(queue)
+
+    async def events():
+        try:
+            while True:
+                payload = await queue.get()
+                yield f"data: {payload}\n\n"
+        finally:
+            subscribers.discard(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/ws")
+async def websocket_resources(websocket: WebSocket):
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=1)
+    if latest_sample is not None:
+        queue.put_nowait(json.dumps(latest_sample))
+    subscribers.add(queue)
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscribers.discard(queue)
+
+def flatten(resource_data):
+    """Numeric metrics of one sample, keyed by history column name."""
+    values = {
+        'cpu_usage': resource_data['cpu']['usage'],
+        'memory_used': resource_data['memory']['used'],
+        'memory_total': resource_data['memory']['total'],
+        'memory_percent': resource_data['memory']['percent'],
+        'disk_used': resource_data['disk']['used'],
+        'disk_total': resource_data['disk']['total'],
+        'disk_percent': resource_data['disk']['percent'],
+        'network_sent': resource_data['network']['sent'],
+        'network_recv': resource_data['network']['recv'],
+        'network_sent_rate': resource_data['network']['sent_rate'],
+        'network_recv_rate': resource_data['network']['recv_rate'],
+        'disk_read_rate': resource_data['disk']['read_rate'],
+        'disk_write_rate': resource_data['disk']['write_rate']
+    }
+    for i, gpu in enumerate(resource_data['gpu']):
+        values[f'gpu{i}_load'] = gpu['load']
+        values[f'gpu{i}_memory_used'] = gpu['memoryUsed']
+    return values
+
+def gpu_columns(history):
+    return sorted(
+        (key for key in history.metrics if key.startswith('gpu') and key.endswith('_load')),
+        key=lambda key: int(key[3:-5])
+    )
+
 @app.get("/download_log")
-def download_log():
-    # Create a CSV log from the resource history
-    log_filename = "resource_log.csv"
+def download_log(from_: str = Query(None, alias="from"), to: str = None, step: float = None,
+                 format: str = "csv", gzip: bool = False):
+    # Stream the resource history straight into the response
     if not resource_history:
         return {"error": "No data to log."}
-    
-    fieldnames = ['timestamp', 'cpu_usage', 'memory_used', 'memory_total', 'memory_percent', 'disk_used', 'disk_total', 'disk_percent', 'network_sent', 'network_recv', 'gpu']
-
-    with open(log_filename, mode='w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for entry in resource_history:
-            gpu_names = ", ".join([gpu['name'] for gpu in entry['gpu']]) if entry['gpu'] else "No GPU"
-            writer.writerow({
-                'timestamp': entry['timestamp'],
-                'cpu_usage': entry['cpu']['usage'],
-                'memory_used': entry['memory']['used'],
-                'memory_total': entry['memory']['total'],
-                'memory_percent': entry['memory']['percent'],
-                'disk_used': entry['disk']['used'],
-                'disk_total': entry['disk']['total'],
-                'disk_percent': entry['disk']['percent'],
-                'network_sent': entry['network']['sent'],
-                'network_recv': entry['network']['recv'],
-                'gpu': gpu_names
-            })
-    
-    return FileResponse(log_filename, media_type='text/csv', filename=log_filename)
+    if format not in export.FORMATS:
+        return {"error": f"Unknown format '{format}', expected one of {', '.join(export.FORMATS)}."}
+    if format == "arrow":
+        try:
+            import pyarrow
+        except ImportError:
+            return {"error": "The arrow format requires pyarrow to be installed."}
+    try:
+        start, end = export.parse_time(from_), export.parse_time(to)
+    except ValueError as e:
+        return {"error": f"Invalid time range: {e}"}
+
+    fieldnames = ['cpu_usage', 'memory_used', 'memory_total', 'memory_percent', 'disk_used', 'disk_total', 'disk_percent', 'network_sent', 'network_recv']
+    max_points = None
+    if step and start is not None:
+        max_points = int(((end or datetime.now().timestamp()) - start) / step) + 1
+    _, data = resource_history.query(fieldnames, start=start, end=end, max_points=max_points)
+    data = export.thin(data, step)
+    labels = {'gpu': resource_history.labels.get('gpu', "No GPU")}
+
+    media_type, extension = export.FORMATS[format]
+    log_filename = f"resource_log.{extension}"
+    chunks = export.WRITERS[format](data, labels)
+    if gzip:
+        chunks = export.gzip_chunks(chunks)
+        media_type, log_filename = "application/gzip", log_filename + ".gz"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{log_filename}"'})
+
+def query_series(start, end, points):
+    gpu_keys = gpu_columns(resource_history)
+    resolution, data = resource_history.query(
+        ['cpu_usage', 'memory_percent', 'disk_percent', *gpu_keys],
+        start=start, end=end, max_points=points * 2)
+    return resolution, gpu_keys, plotting.downsample(data, points)
 
 @app.get("/plot_graph")
-def plot_graph():
+async def plot_graph(from_: str = Query(None, alias="from"), to: str = None,
+                     width: int = Query(1400, ge=200, le=4000), height: int = Query(1000, ge=200, le=4000)):
     # Plot resource usage over time
     if not resource_history:
         return {"error": "No data to plot."}
+    try:
+        start, end = export.parse_time(from_), export.parse_time(to)
+    except ValueError as e:
+        return {"error": f"Invalid time range: {e}"}
 
-    # Extract data
-    timestamps = [entry['timestamp'] for entry in resource_history]
-    timestamps = [datetime.strptime(ts, "%Y-%m-%d %H:%M:%S") for ts in timestamps]
-    cpu_usage = [entry['cpu']['usage'] for entry in resource_history]
-    memory_percent = [entry['memory']['percent'] for entry in resource_history]
-    disk_percent = [entry['disk']['percent'] for entry in resource_history]
-    
-    # Assuming GPU data is available in each resource entry
-    gpus = [entry['gpu'] for entry in resource_history]  # List of GPU data for each entry
-    
-    # Create a 2x2 subplot grid (2 rows, 2 columns)
-    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
-    fig.tight_layout(pad=5.0)  # Add padding between subplots
-
-    # Plot CPU usage in the first subplot (top-left)
-    axs[0, 0].plot(timestamps, cpu_usage, label="CPU Usage (%)", color='red', marker='o')
-    axs[0, 0].set_title("CPU Usage Over Time")
-    axs[0, 0].set_xlabel("Timestamp")
-    axs[0, 0].set_ylabel("Usage (%)")
-    axs[0, 0].set_xticklabels([ts.strftime("%H:%M:%S") for ts in timestamps], rotation=45, ha='right')
-    axs[0, 0].legend()
-    axs[0, 0].set_ylim(0, 100)
-
-    # Plot Memory usage in the second subplot (top-right)
-    axs[0, 1].plot(timestamps, memory_percent, label="Memory Usage (%)", color='blue', marker='o')
-    axs[0, 1].set_title("Memory Usage Over Time")
-    axs[0, 1].set_xlabel("Timestamp")
-    axs[0, 1].set_ylabel("Usage (%)")
-    axs[0, 1].set_xticklabels([ts.strftime("%H:%M:%S") for ts in timestamps], rotation=45, ha='right')
-    axs[0, 1].legend()
-    axs[0, 1].set_ylim(0, 100)
-
-    # Plot Disk usage in the third subplot (bottom-left)
-    axs[1, 0].plot(timestamps, disk_percent, label="Disk Usage (%)", color='green', marker='o')
-    axs[1, 0].set_title("Disk Usage Over Time")
-    axs[1, 0].set_xlabel("Timestamp")
-    axs[1, 0].set_ylabel("Usage (%)")
-    axs[1, 0].set_xticklabels([ts.strftime("%H:%M:%S") for ts in timestamps], rotation=45, ha='right')
-    axs[1, 0].legend()
-    axs[1, 0].set_ylim(0, 100)
-
-    # Plot GPU usage in the fourth subplot (bottom-right)
-    # If there are multiple GPUs, we will plot them in the same graph
-    for gpu_index in range(len(gpus[0])):  # Assuming multiple GPUs
-        gpu_data = [gpu[gpu_index]['load'] for gpu in gpus]  # Extract GPU load (usage) for each GPU
-        axs[1, 1].plot(timestamps, gpu_data, label=f"GPU {gpu_index+1} Usage (%)", marker='o')
-    
-    axs[1, 1].set_title("GPU Usage Over Time")
-    axs[1, 1].set_xlabel("Timestamp")
-    axs[1, 1].set_ylabel("Usage (%)")
-    axs[1, 1].set_xticklabels([ts.strftime("%H:%M:%S") for ts in timestamps], rotation=45, ha='right')
-    axs[1, 1].legend()
-    axs[1, 1].set_ylim(0, 100)
+    # Repeated requests within one sampling tick share a single render
+    key = (resource_history.version, start, end, width, height)
+    png = plot_cache.get(key)
+    if png is None:
+        # Each panel is roughly half the figure wide; one bucket per pixel
+        _, gpu_keys, series = query_series(start, end, width // 2)
+        loop = asyncio.get_event_loop()
+        png = loop.run_in_executor(plot_pool, plotting.render_png, series, gpu_keys, width, height)
+        plot_cache[key] = png
+        while len(plot_cache) > PLOT_CACHE_SIZE:
+            plot_cache.pop(next(iter(plot_cache)))
+    try:
+        body = await png
+    except Exception:
+        plot_cache.pop(key, None)
+        raise
+    return Response(content=body, media_type="image/png")
 
-    # Save plot to a BytesIO buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-
-    # Return the plot as a StreamingResponse
-    return StreamingResponse(buf, media_type="image/png")
+@app.get("/api/series")
+def get_series(from_: str = Query(None, alias="from"), to: str = None,
+               points: int = Query(500, ge=10, le=10000)):
+    # Downsampled series for client-side rendering
+    try:
+        start, end = export.parse_time(from_), export.parse_time(to)
+    except ValueError as e:
+        return {"error": f"Invalid time range: {e}"}
+    resolution, _, series = query_series(start, end, points)
+    return {
+        "resolution": resolution,
+        "series": {
+            key: {
+                "timestamp": x.tolist(),
+                "values": [None if v != v else v for v in y.tolist()]
+            } for key, (x, y) in series.items()
+        }
+    }
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -179,4 +455,9 @@ def dashboard_ui():
 
 if __name__ == "__main__":
     import uvicorn
+    parser = argparse.ArgumentParser(description="Resource dashboard server.")
+    parser.add_argument("--interval", "-i", type=float, default=SAMPLE_INTERVAL,
+                        help="Seconds between background samples (default: %(default)s)")
+    args = parser.parse_args()
+    SAMPLE_INTERVAL = args.interval
     uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info", reload=False)
\ No newline at end of file
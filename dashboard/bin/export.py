@@ -0,0 +1,116 @@
+"""Streaming serializers for exporting dashboard history.
+
+Every writer is a generator that yields encoded chunks as rows are
+serialized, so exports go straight into the HTTP response without a
+temporary file and without holding the whole document in memory.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+CHUNK_ROWS = 1000
+
+
+def parse_time(value):
+    """Accept epoch seconds or a "YYYY-MM-DD[ HH:MM:SS]" local timestamp."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def thin(data, step):
+    """Keep the first row of every `step`-second bucket."""
+    if not step or not len(data["timestamp"]):
+        return data
+    _, keep = np.unique(data["timestamp"] // step, return_index=True)
+    return {key: values[keep] for key, values in data.items()}
+
+
+def _fmt(value):
+    return "" if value != value else format(value, ".15g")
+
+
+def _timestamps(data):
+    return [datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") for ts in data["timestamp"]]
+
+
+def iter_csv(data, labels):
+    keys = [key for key in data if key != "timestamp"]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["timestamp", *keys, *labels])
+    stamps = _timestamps(data)
+    columns = [data[key].tolist() for key in keys]
+    label_values = list(labels.values())
+    for start in range(0, len(stamps), CHUNK_ROWS):
+        for i in range(start, min(start + CHUNK_ROWS, len(stamps))):
+            writer.writerow([stamps[i], *(_fmt(column[i]) for column in columns), *label_values])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if not stamps:
+        yield buf.getvalue().encode()
+
+
+def iter_ndjson(data, labels):
+    keys = [key for key in data if key != "timestamp"]
+    stamps = _timestamps(data)
+    columns = [data[key].tolist() for key in keys]
+    for start in range(0, len(stamps), CHUNK_ROWS):
+        lines = []
+        for i in range(start, min(start + CHUNK_ROWS, len(stamps))):
+            row = {"timestamp": stamps[i]}
+            for key, column in zip(keys, columns):
+                row[key] = None if column[i] != column[i] else column[i]
+            row.update(labels)
+            lines.append(json.dumps(row))
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def iter_arrow(data, labels):
+    """Arrow IPC stream, one record batch per chunk (requires pyarrow)."""
+    import pyarrow as pa
+
+    n = len(data["timestamp"])
+    fields = [pa.field("timestamp", pa.timestamp("ms"))]
+    fields += [pa.field(key, pa.float64()) for key in data if key != "timestamp"]
+    fields += [pa.field(key, pa.string()) for key in labels]
+    schema = pa.schema(fields)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for start in range(0, max(n, 1), CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, n)
+            arrays = [pa.array((data["timestamp"][start:end] * 1000).astype("int64"), pa.timestamp("ms"))]
+            arrays += [pa.array(values[start:end], pa.float64(), from_pandas=True)
+                       for key, values in data.items() if key != "timestamp"]
+            arrays += [pa.array([value] * (end - start), pa.string()) for value in labels.values()]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+WRITERS = {"csv": iter_csv, "ndjson": iter_ndjson, "arrow": iter_arrow}
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -0,0 +1,169 @@
+"""Bounded, array-backed resource history for the dashboard.
+
+Samples go into a fixed-capacity raw ring (one float64 array per metric) and
+are rolled up on the fly into coarser tiers holding min/mean/max per bucket,
+so memory stays constant and long ranges are answered from a coarse tier.
+"""
+import threading
+
+import numpy as np
+
+STATS = ("min", "mean", "max")
+
+
+class Ring:
+    """Fixed-capacity circular buffer with one float64 column per metric."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0
+        self.data = {"timestamp": np.full(capacity, np.nan)}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp, values):
+        for key in values:
+            if key not in self.data:
+                self.data[key] = np.full(self.capacity, np.nan)
+        for key, column in self.data.items():
+            column[self.head] = timestamp if key == "timestamp" else values.get(key, np.nan)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def column(self, key):
+        """Column in chronological order (oldest first)."""
+        column = self.data[key]
+        if self.size < self.capacity:
+            return column[:self.size].copy()
+        return np.concatenate((column[self.head:], column[:self.head]))
+
+    @property
+    def wrapped(self):
+        return self.size == self.capacity
+
+    @property
+    def oldest(self):
+        return self.column("timestamp")[0] if self.size else np.nan
+
+    def window(self, start=None, end=None):
+        """Slice bounds of [start, end] within the chronological columns."""
+        ts = self.column("timestamp")
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        return lo, hi
+
+
+class Tier:
+    """Rollup of the raw stream into fixed-width buckets (min/mean/max)."""
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.ring = Ring(capacity)
+        self._bucket = None
+        self._acc = {}
+
+    def add(self, timestamp, values):
+        bucket = timestamp // self.resolution * self.resolution
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+        for key, value in values.items():
+            if value is None or value != value:
+                continue
+            acc = self._acc.get(key)
+            if acc is None:
+                self._acc[key] = [value, value, value, 1]
+            else:
+                acc[0] = min(acc[0], value)
+                acc[1] += value
+                acc[2] = max(acc[2], value)
+                acc[3] += 1
+
+    def flush(self):
+        if self._bucket is None or not self._acc:
+            return
+        row = {}
+        for key, (lo, total, hi, count) in self._acc.items():
+            row[key + ":min"] = lo
+            row[key + ":mean"] = total / count
+            row[key + ":max"] = hi
+        self.ring.append(self._bucket, row)
+        self._acc = {}
+
+
+class History:
+    """Raw samples plus automatically maintained rollup tiers."""
+
+    def __init__(self, raw_capacity=3600, tiers=((60, 1440), (3600, 720))):
+        self.raw = Ring(raw_capacity)
+        self.tiers = [Tier(resolution, capacity) for resolution, capacity in tiers]
+        self.metrics = []
+        self.labels = {}
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.raw)
+
+    def append(self, timestamp, values, labels=None):
+        with self.lock:
+            for key in values:
+                if key not in self.metrics:
+                    self.metrics.append(key)
+            self.raw.append(timestamp, values)
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+            if labels:
+                self.labels.update(labels)
+            self.version += 1
+
+    def latest(self):
+        if not self.raw.size:
+            return None
+        i = (self.raw.head - 1) % self.raw.capacity
+        return {key: column[i] for key, column in self.raw.data.items()}
+
+    def _pick(self, start, end, max_points):
+        levels = [(0, self.raw)] + [(t.resolution, t.ring) for t in self.tiers]
+        candidates = [(res, ring) for res, ring in levels if len(ring)]
+        if not candidates:
+            return 0, self.raw
+        for res, ring in candidates:
+            covers = not ring.wrapped if start is None else ring.oldest <= start
+            if not covers:
+                continue
+            lo, hi = ring.window(start, end)
+            if max_points is None or hi - lo <= max_points:
+                return res, ring
+        return candidates[-1]
+
+    def query(self, metrics=None, start=None, end=None, max_points=None, resolution=None):
+        """Return (resolution, columns) for the finest tier covering the range.
+
+        Raw data is returned as plain metric columns; rollup tiers return the
+        bucket mean under the metric name plus "<metric>:min"/"<metric>:max".
+        """
+        with self.lock:
+            return self._query(metrics, start, end, max_points, resolution)
+
+    def _query(self, metrics, start, end, max_points, resolution):
+        metrics = list(metrics or self.metrics)
+        if resolution is None:
+            resolution, ring = self._pick(start, end, max_points)
+        else:
+            ring = self.raw if resolution == 0 else next(
+                t.ring for t in self.tiers if t.resolution == resolution)
+        lo, hi = ring.window(start, end)
+        out = {"timestamp": ring.column("timestamp")[lo:hi]}
+        for key in metrics:
+            if resolution == 0:
+                column = ring.data.get(key)
+                out[key] = ring.column(key)[lo:hi] if column is not None else np.full(hi - lo, np.nan)
+                continue
+            for stat in STATS:
+                name = key + ":" + stat
+                values = ring.column(name)[lo:hi] if name in ring.data else np.full(hi - lo, np.nan)
+                out[key if stat == "mean" else name] = values
+        return resolution, out
@@ -0,0 +1,76 @@
+"""Downsampling and off-loop PNG rendering for the dashboard graphs.
+
+render_png() only uses the object-oriented matplotlib API (no pyplot global
+state) so it is safe to run in worker processes, and every figure it
+creates is released as soon as the PNG bytes are produced.
+"""
+import io
+from datetime import datetime
+
+import numpy as np
+
+PANELS = [
+    ("CPU Usage Over Time", [("cpu_usage", "CPU Usage (%)", "red")]),
+    ("Memory Usage Over Time", [("memory_percent", "Memory Usage (%)", "blue")]),
+    ("Disk Usage Over Time", [("disk_percent", "Disk Usage (%)", "green")]),
+    ("GPU Usage Over Time", []),
+]
+
+
+def minmax_downsample(x, y, buckets):
+    """Keep the min and max point of each of `buckets` equal-count buckets.
+
+    Preserves spikes that plain decimation would drop while emitting at most
+    2 * buckets points, which is all a plot `buckets` pixels wide can show.
+    """
+    n = len(x)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((np.nan_to_num(y, nan=-np.inf), bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    keep = np.unique(np.concatenate((order[starts], order[ends])))
+    return x[keep], y[keep]
+
+
+def downsample(data, buckets):
+    """Downsample every series of a history query to `buckets` buckets."""
+    out = {}
+    for key, values in data.items():
+        if key == "timestamp":
+            continue
+        out[key] = minmax_downsample(data["timestamp"], values, buckets)
+    return out
+
+
+def render_png(series, gpu_keys, width=1400, height=1000, dpi=100):
+    """Render the 2x2 resource figure from downsampled (x, y) series."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import DateFormatter
+    from matplotlib.figure import Figure
+
+    gpu_lines = [(key, f"GPU {i+1} Usage (%)", None) for i, key in enumerate(gpu_keys)]
+    panels = PANELS[:3] + [(PANELS[3][0], gpu_lines)]
+
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(2, 2)
+    for ax, (title, lines) in zip(axs.flat, panels):
+        for key, label, color in lines:
+            x, y = series[key]
+            ax.plot([datetime.fromtimestamp(ts) for ts in x], y, label=label, color=color, linewidth=1)
+        ax.set_title(title)
+        ax.set_xlabel("Timestamp")
+        ax.set_ylabel("Usage (%)")
+        ax.xaxis.set_major_formatter(DateFormatter("%H:%M:%S"))
+        ax.tick_params(axis="x", labelrotation=45)
+        if lines:
+            ax.legend()
+        ax.set_ylim(0, 100)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    fig.clear()
+    return buf.getvalue()
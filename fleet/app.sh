@@ -0,0 +1,8 @@
+#!/bin/bash
+
+# Activate the conda environment
+source "$(conda info --base)/etc/profile.d/conda.sh"
+conda activate "$OSENV"
+
+python3 fleet/bin/collector.py "$@"
+conda deactivate
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Minimal sampling agent: ships process counters to a fleet collector.
+
+The agent only runs the shared /proc sampler (NumPy + psutil, no pandas or
+models) and sends batches of ticks as binary frames (see frames.py) to the
+collector, which does all the scoring. Frames go over HTTP, one POST per
+batch, or over a persistent TCP connection, and are kept in a bounded
+buffer while the collector is unreachable.
+
+    python3 fleet/bin/agent.py --collector http://10.0.0.5:8100 --batch 3
+    python3 fleet/bin/agent.py --collector tcp://10.0.0.5:8101
+"""
+import argparse
+import os
+import resource
+import socket
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.sampler import Sampler
+from frames import encode, tick_from_snapshot
+
+
+class HTTPSender:
+    def __init__(self, url, timeout=5.0):
+        self.url = url.rstrip("/") + "/ingest"
+        self.timeout = timeout
+
+    def send(self, frame):
+        """POST one frame; ValueError if the collector rejects it (4xx), OSError if it may succeed later."""
+        request = urllib.request.Request(self.url, data=frame, method="POST",
+                                         headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500:
+                raise ValueError(f"collector rejected frame: HTTP {e.code} {e.reason}")
+            raise
+
+    def close(self):
+        pass
+
+
+class TCPSender:
+    """Streams frames back to back over one connection, reconnecting after errors."""
+
+    def __init__(self, host, port, timeout=5.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+
+    def send(self, frame):
+        if self.sock is None:
+            self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        try:
+            self.sock.sendall(frame)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def make_sender(url):
+    parts = urlsplit(url)
+    if parts.scheme == "tcp":
+        return TCPSender(parts.hostname, parts.port or 8101)
+    if parts.scheme in ("http", "https"):
+        return HTTPSender(url)
+    raise ValueError(f"unsupported collector URL {url!r} (use http://host:port or tcp://host:port)")
+
+
+def run_agent(sender, host, interval, batch, buffer, compress):
+    """Sample every `interval` seconds and send every `batch` ticks as one frame."""
+    sampler = Sampler()
+    sampler.sample()
+    cpu_count = os.cpu_count() or 1
+    memory_total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    pending = deque(maxlen=buffer)
+    ticks = []
+    sent = failed = dropped = 0
+    next_tick = time.monotonic() + interval
+    print(f"Shipping {host} every {interval * batch:g}s ({batch} tick(s) per frame). Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            ticks.append(tick_from_snapshot(sampler.sample()))
+            if len(ticks) >= batch:
+                pending.append(encode(host, cpu_count, memory_total, ticks, compress))
+                ticks = []
+                while pending:
+                    try:
+                        sender.send(pending[0])
+                    except ValueError as e:
+                        # retrying a frame the collector refused cannot succeed
+                        dropped += 1
+                        pending.popleft()
+                        print(f"Dropped frame: {e}", file=sys.stderr)
+                        continue
+                    except OSError as e:
+                        failed += 1
+                        print(f"Collector unreachable ({e}); {len(pending)} frame(s) buffered", file=sys.stderr)
+                        break
+                    sent += 1
+                    pending.popleft()
+            next_tick += interval
+            if next_tick < time.monotonic():
+                next_tick = time.monotonic() + interval
+    except KeyboardInterrupt:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"\nStopped after {sent} frame(s), {failed} failed send(s), {dropped} rejected frame(s); "
+              f"peak RSS {rss:.1f} MB.")
+    finally:
+        sender.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ship process samples to a fleet collector.")
+    parser.add_argument("--collector", default="http://127.0.0.1:8100",
+                        help="http://host:port or tcp://host:port (default: http://127.0.0.1:8100)")
+    parser.add_argument("--host", default=socket.gethostname(), help="Name this host reports as")
+    parser.add_argument("-i", "--interval", type=float, default=5.0, help="Seconds between samples")
+    parser.add_argument("--batch", type=int, default=1, help="Ticks per frame (default: 1)")
+    parser.add_argument("--buffer", type=int, default=120,
+                        help="Frames kept while the collector is unreachable (default: 120)")
+    parser.add_argument("--no-compress", action="store_true", help="Send frames without zlib")
+    args = parser.parse_args()
+    run_agent(make_sender(args.collector), args.host, args.interval, max(1, args.batch), args.buffer,
+              not args.no_compress)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Fleet collector: scores the processes of every agent's host in batch.
+
+Agents (agent.py) send binary frames over HTTP (POST /ingest) or a TCP
+stream (--tcp-port). Received ticks are queued and, every --score-interval
+seconds, the queued rows of all hosts are stacked into one matrix per model
+and scored in a single pass by the registry's anomaly IsolationForest and
+scheduler burst-time forest, with the same features anomaly.py and
+schedule.py compute locally. The latest results per host are served on
+/hosts, /hosts/{host} and /metrics.
+
+    python3 fleet/bin/collector.py --port 8100 --tcp-port 8101
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common import metrics
+from common.forest import FlatForest, FlatIsolationForest
+from common.models import ModelHandle
+from frames import HEADER, MAX_BODY, body_length, decode
+
+# schedule.py's perf_metrics, in order
+SCHEDULER_FEATURES = [
+    'CPU capacity provisioned [MHZ]',
+    'Memory capacity provisioned [KB]',
+    'Memory usage [KB]',
+    'Disk write throughput [KB/s]',
+    'CPU cores'
+]
+
+
+def load_forest(bundle):
+    """Registry builder; same check as schedule.load_forest."""
+    features = bundle.meta.get("features")
+    if features and features != SCHEDULER_FEATURES:
+        raise ValueError(f"{bundle.name} v{bundle.version} expects features {features}")
+    return FlatForest.from_bundle(bundle)
+
+
+detector = ModelHandle("anomaly", FlatIsolationForest.from_bundle)
+scheduler = ModelHandle("scheduler", load_forest)
+
+app = FastAPI()
+app.state.host = "127.0.0.1"
+
+
+class Fleet:
+    """Queued ticks and the latest scored results of every host."""
+
+    def __init__(self, top=10, stale=300.0):
+        self.top = top
+        self.stale = stale
+        self.lock = threading.Lock()
+        self.queue = []
+        self.hosts = {}
+        self.frames = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.scored_rows = 0
+        self.score_seconds = 0.0
+
+    def ingest(self, data):
+        frame = decode(data)
+        with self.lock:
+            self.frames += 1
+            self.bytes += len(data)
+            host = self.hosts.setdefault(frame.host, {"ticks": 0})
+            host.update(cpu_count=frame.cpu_count, memory_total=frame.memory_total, last_seen=time.time())
+            host["ticks"] += len(frame.ticks)
+            self.queue.extend((frame.host, frame.cpu_count, tick) for tick in frame.ticks)
+        return len(frame.ticks)
+
+    def score(self):
+        """Score every queued tick of every host in one pass per model."""
+        with self.lock:
+            queue, self.queue = self.queue, []
+        if not queue:
+            return 0
+        start = time.perf_counter()
+        rows = np.concatenate([tick.rows for _, _, tick in queue])
+        sizes = [len(tick.rows) for _, _, tick in queue]
+        cpu_mhz = np.repeat([tick.cpu_mhz for _, _, tick in queue], sizes)
+        cores = np.repeat([cpu_count for _, cpu_count, _ in queue], sizes)
+        write = rows["write_rate"].astype(np.float64)
+        zeros = np.zeros(len(rows))
+
+        # anomaly.py's perf_metrics; per-process network counters do not exist
+        anomaly_X = np.column_stack([rows["cpu_percent"], rows["rss"] / 1024.0, write / 1024.0, zeros, zeros])
+        scorable = ~np.isnan(anomaly_X).any(axis=1)
+        labels, scores = np.ones(len(rows), dtype=int), np.full(len(rows), np.nan)
+        if scorable.any():
+            labels[scorable], scores[scorable] = detector.get().score(anomaly_X[scorable])
+
+        # as schedule.features: Memory usage [KB] is the raw rss the model was trained against
+        scheduler_X = np.column_stack([cpu_mhz, rows["vms"] / 1024.0, rows["rss"].astype(np.float64),
+                                       write / 1024.0, cores])
+        rankable = ~np.isnan(scheduler_X).any(axis=1)
+        burst = np.full(len(rows), np.nan)
+        if rankable.any():
+            burst[rankable] = cpu_mhz[rankable] / scheduler.get().predict(scheduler_X[rankable]) * 10
+
+        results = {}
+        offset = 0
+        for (host, _, tick), size in zip(queue, sizes):
+            part = slice(offset, offset + size)
+            offset += size
+            results[host] = self._summarize(tick, labels[part], scores[part], burst[part])
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            for host, result in results.items():
+                self.hosts[host]["result"] = result
+            self.scored_rows += len(rows)
+            self.score_seconds += elapsed
+        return len(rows)
+
+    def _summarize(self, tick, labels, scores, burst):
+        pids = tick.rows["pid"]
+        worst = np.argsort(np.nan_to_num(scores, nan=np.inf))[:self.top]
+        shortest = np.argsort(np.nan_to_num(burst, nan=np.inf))[:self.top]
+        return {
+            "timestamp": tick.timestamp,
+            "processes": len(pids),
+            "anomalous": int((labels == -1).sum()),
+            "anomalies": [{"pid": int(pids[i]), "name": tick.names[i], "score": float(scores[i]),
+                           "anomaly": bool(labels[i] == -1)} for i in worst if not np.isnan(scores[i])],
+            "shortest": [{"pid": int(pids[i]), "name": tick.names[i], "burst_ms": float(burst[i])}
+                         for i in shortest if not np.isnan(burst[i])],
+        }
+
+    def summary(self):
+        now = time.time()
+        with self.lock:
+            return {
+                name: {"last_seen": host["last_seen"], "stale": now - host["last_seen"] > self.stale,
+                       "ticks": host["ticks"], "cpu_count": host["cpu_count"],
+                       "processes": host.get("result", {}).get("processes"),
+                       "anomalous": host.get("result", {}).get("anomalous")}
+                for name, host in self.hosts.items()
+            }
+
+    def host(self, name):
+        with self.lock:
+            host = self.hosts.get(name)
+            return None if host is None else dict(host)
+
+    def exposition(self):
+        out = metrics.Exposition()
+        with self.lock:
+            hosts = list(self.hosts.items())
+            out.add("aios_fleet_frames_total", "Frames received from agents.", "counter", self.frames)
+            out.add("aios_fleet_bytes_total", "Frame bytes received from agents.", "counter", self.bytes)
+            out.add("aios_fleet_rejected_frames_total", "Frames that failed to decode.", "counter", self.rejected)
+            out.add("aios_fleet_scored_rows_total", "Process rows scored.", "counter", self.scored_rows)
+            out.add("aios_fleet_score_seconds_total", "Time spent scoring.", "counter", self.score_seconds)
+        out.add("aios_fleet_hosts", "Hosts that have reported.", "gauge", len(hosts))
+        out.add("aios_fleet_last_seen_timestamp_seconds", "When each host last sent a frame.", "gauge",
+                [({"host": name}, host["last_seen"]) for name, host in hosts])
+        scored = [(name, host["result"]) for name, host in hosts if "result" in host]
+        out.add("aios_fleet_processes", "Processes scored in each host's latest tick.", "gauge",
+                [({"host": name}, result["processes"]) for name, result in scored])
+        out.add("aios_fleet_anomalous_processes", "Processes flagged anomalous in each host's latest tick.", "gauge",
+                [({"host": name}, result["anomalous"]) for name, result in scored])
+        out.add("aios_anomaly_score", "Anomaly score of each host's most anomalous processes (lower is more anomalous).",
+                "gauge", [({"host": name, "pid": p["pid"], "name": p["name"]}, p["score"])
+                          for name, result in scored for p in result["anomalies"]])
+        out.add("aios_predicted_burst_milliseconds", "Predicted burst time of each host's shortest processes.",
+                "gauge", [({"host": name, "pid": p["pid"], "name": p["name"]}, p["burst_ms"])
+                          for name, result in scored for p in result["shortest"]])
+        models = [(name, handle.info()) for name, handle in (("anomaly", detector), ("scheduler", scheduler))
+                  if handle.version is not None]
+        out.add("aios_model_version", "Registry version of the model in use.", "gauge",
+                [({"model": name}, info["version"]) for name, info in models])
+        return out.render()
+
+
+fleet = Fleet()
+SCORE_INTERVAL = 1.0
+TCP_PORT = 8101
+
+
+async def score_loop():
+    loop = asyncio.get_event_loop()
+    next_tick = loop.time()
+    while True:
+        try:
+            await loop.run_in_executor(None, fleet.score)
+        except Exception as e:
+            print(f"Scoring failed: {e}")
+        next_tick += SCORE_INTERVAL
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def handle_stream(reader, writer):
+    """Read back-to-back frames from one agent connection, decoding them off the event loop."""
+    loop = asyncio.get_event_loop()
+    try:
+        while True:
+            header = await reader.readexactly(HEADER.size)
+            body = await reader.readexactly(body_length(header))
+            try:
+                await loop.run_in_executor(None, fleet.ingest, header + body)
+            except ValueError:
+                fleet.rejected += 1
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except ValueError:
+        # lost frame alignment; the agent reconnects
+        fleet.rejected += 1
+    finally:
+        writer.close()
+
+
+@app.on_event("startup")
+async def start():
+    app.state.score_task = asyncio.ensure_future(score_loop())
+    if TCP_PORT:
+        app.state.tcp_server = await asyncio.start_server(handle_stream, app.state.host, TCP_PORT)
+
+
+@app.on_event("shutdown")
+async def stop():
+    app.state.score_task.cancel()
+    if TCP_PORT:
+        app.state.tcp_server.close()
+
+
+@app.post("/ingest")
+async def ingest(request: Request):
+    """One frame per request; bodies over a frame's maximum size get 413 before they are buffered."""
+    limit = HEADER.size + MAX_BODY
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        fleet.rejected += 1
+        raise HTTPException(status_code=413, detail=f"frames are at most {limit} bytes")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            fleet.rejected += 1
+            raise HTTPException(status_code=413, detail=f"frames are at most {limit} bytes")
+        chunks.append(chunk)
+    try:
+        ticks = await asyncio.get_event_loop().run_in_executor(None, fleet.ingest, b"".join(chunks))
+    except ValueError as e:
+        fleet.rejected += 1
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"accepted": ticks}
+
+
+@app.get("/hosts")
+def list_hosts():
+    return fleet.summary()
+
+
+@app.get("/hosts/{name}")
+def get_host(name: str):
+    host = fleet.host(name)
+    if host is None:
+        raise HTTPException(status_code=404, detail=f"unknown host {name!r}")
+    return host
+
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(fleet.exposition(), media_type=metrics.CONTENT_TYPE)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Score process samples sent by fleet agents.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8100, help="HTTP port (default: 8100)")
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT,
+                        help="Port for streamed TCP frames, 0 to disable (default: 8101)")
+    parser.add_argument("--score-interval", type=float, default=SCORE_INTERVAL,
+                        help="Seconds between batch scoring rounds (default: 1)")
+    parser.add_argument("--top", type=int, default=10, help="Processes kept per host and list (default: 10)")
+    args = parser.parse_args()
+    SCORE_INTERVAL = args.score_interval
+    TCP_PORT = args.tcp_port
+    fleet.top = args.top
+    app.state.host = args.host
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", reload=False)
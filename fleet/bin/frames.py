@@ -0,0 +1,125 @@
+"""Binary frames shipped from agents to the collector.
+
+A frame carries a batch of ticks from one host:
+
+    header   b"AIOF", u8 version, u8 flags (1 = zlib), u16 0, u32 body length
+    body     u16 host length, host (utf-8), u32 cpu count, u64 memory total,
+             u32 tick count, then per tick:
+                 f64 timestamp, f64 interval, f32 cpu MHz, u32 rows,
+                 rows x ROW (packed little-endian records),
+                 u32 names length, process names (utf-8, NUL-separated)
+
+Rows are written straight from the sampler's NumPy columns and read back
+with np.frombuffer, so neither end touches per-process Python objects.
+The header alone says how long the frame is, so frames can be streamed
+back to back over a TCP connection or sent one per HTTP request. Frames
+come from the network, so bodies are capped at MAX_BODY bytes before and
+after decompression, and anything malformed raises ValueError.
+"""
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b"AIOF"
+VERSION = 1
+COMPRESSED = 1
+MAX_BODY = 64 * 1024 * 1024
+HEADER = struct.Struct("<4sBBHI")
+HOST = struct.Struct("<IQI")
+TICK = struct.Struct("<ddfI")
+
+ROW = np.dtype([
+    ("pid", "<u4"),
+    ("start_time", "<u8"),
+    ("cpu_percent", "<f4"),
+    ("rss", "<u8"),
+    ("vms", "<u8"),
+    ("read_rate", "<f4"),
+    ("write_rate", "<f4"),
+])
+
+Frame = namedtuple("Frame", ["host", "cpu_count", "memory_total", "ticks"])
+Tick = namedtuple("Tick", ["timestamp", "interval", "cpu_mhz", "rows", "names"])
+
+
+def tick_from_snapshot(snap):
+    """Rows of every process with a full interval of deltas in a Snapshot."""
+    keep = ~snap.is_new
+    rows = np.empty(int(keep.sum()), dtype=ROW)
+    for name in ROW.names:
+        rows[name] = getattr(snap, name)[keep]
+    freq = snap.host["cpu_freq"]
+    return Tick(snap.timestamp, snap.interval, freq.current if freq else float("nan"), rows,
+                [name for name, k in zip(snap.name, keep.tolist()) if k])
+
+
+def encode(host, cpu_count, memory_total, ticks, compress=True):
+    host = host.encode()
+    parts = [struct.pack("<H", len(host)), host, HOST.pack(cpu_count, memory_total, len(ticks))]
+    for tick in ticks:
+        names = "\0".join(tick.names).encode("utf-8", "replace")
+        parts += [TICK.pack(tick.timestamp, tick.interval, tick.cpu_mhz, len(tick.rows)),
+                  np.ascontiguousarray(tick.rows, dtype=ROW).tobytes(), struct.pack("<I", len(names)), names]
+    body = b"".join(parts)
+    flags = 0
+    if compress:
+        body, flags = zlib.compress(body, 1), COMPRESSED
+    return HEADER.pack(MAGIC, VERSION, flags, 0, len(body)) + body
+
+
+def body_length(header):
+    """Length of the body following a HEADER.size-byte header; ValueError if it is not one."""
+    try:
+        magic, version, _, _, length = HEADER.unpack(header)
+    except struct.error:
+        raise ValueError("short frame header")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} frame")
+    if length > MAX_BODY:
+        raise ValueError(f"frame body of {length} bytes exceeds {MAX_BODY}")
+    return length
+
+
+def decode(data):
+    """Frame from one complete header + body."""
+    length = body_length(data[:HEADER.size])
+    flags = data[5]
+    body = data[HEADER.size:HEADER.size + length]
+    if len(body) != length:
+        raise ValueError("truncated frame")
+    if flags & COMPRESSED:
+        inflate = zlib.decompressobj()
+        try:
+            body = inflate.decompress(body, MAX_BODY)
+        except zlib.error as e:
+            raise ValueError(f"corrupt compressed frame: {e}")
+        if inflate.unconsumed_tail or not inflate.eof:
+            raise ValueError(f"compressed frame is truncated or inflates past {MAX_BODY} bytes")
+    try:
+        return _parse(memoryview(body))
+    except struct.error as e:
+        raise ValueError(f"malformed frame: {e}")
+
+
+def _parse(view):
+    (host_len,) = struct.unpack_from("<H", view, 0)
+    offset = 2 + host_len
+    host = bytes(view[2:offset]).decode()
+    cpu_count, memory_total, n_ticks = HOST.unpack_from(view, offset)
+    offset += HOST.size
+    ticks = []
+    for _ in range(n_ticks):
+        timestamp, interval, cpu_mhz, n_rows = TICK.unpack_from(view, offset)
+        offset += TICK.size
+        rows = np.frombuffer(view, dtype=ROW, count=n_rows, offset=offset)
+        offset += n_rows * ROW.itemsize
+        (names_len,) = struct.unpack_from("<I", view, offset)
+        offset += 4
+        names = bytes(view[offset:offset + names_len]).decode("utf-8", "replace").split("\0") if n_rows else []
+        offset += names_len
+        if len(names) != n_rows:
+            raise ValueError(f"{n_rows} rows but {len(names)} names")
+        ticks.append(Tick(timestamp, interval, cpu_mhz, rows, names))
+    return Frame(host, cpu_count, memory_total, ticks)
@@ -2,18 +2,21 @@
 # Save as /usr/local/bin/ai-monitor.py
 
 import os
+import sys
 import time
 import psutil
-import subprocess
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 
-# Create history database
-if not os.path.exists('~/ai_usage_history.csv'):
-    pd.DataFrame(columns=['timestamp', 'cpu_usage', 'memory_usage', 'gpu_usage', 
-                         'disk_io', 'network_io', 'ml_framework', 'runtime']).to_csv('~/ai_usage_history.csv')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.gpu import telemetry
+from common.usage import LEGACY_CSV, UsageStore
 
-history = pd.read_csv('~/ai_usage_history.csv')
+# Usage history, appended in batches (common/usage.py)
+store = UsageStore()
+if not store.count() and os.path.exists(LEGACY_CSV):
+    print(f"Imported {store.import_csv(LEGACY_CSV)} rows from {LEGACY_CSV}")
+
+history = store.read(['cpu_usage', 'memory_usage', 'gpu_usage', 'disk_io', 'network_io', 'runtime'])
 model = RandomForestRegressor()
 
 if len(history) > 10:
@@ -53,16 +56,22 @@ def adjust_process_priority(pid, predicted_time):
     except:
         pass
 
+def gpu_utilization():
+    """Mean utilization across GPUs from the shared NVML session"""
+    gpus = telemetry().read()
+    return sum(gpu.load for gpu in gpus) / len(gpus) if gpus else 0.0
+
 # Main monitoring loop
 while True:
     ml_processes = detect_ml_processes()
+    gpu_usage = gpu_utilization()
     
     for pid, framework in ml_processes:
         # Collect system metrics
         metrics = [
             psutil.cpu_percent(),
             psutil.virtual_memory().percent,
-            float(subprocess.getoutput("nvidia-smi --query-gpu=utilization.gpu --format=csv,noheader,nounits")),
+            gpu_usage,
             psutil.disk_io_counters().read_bytes + psutil.disk_io_counters().write_bytes,
             psutil.net_io_counters().bytes_sent + psutil.net_io_counters().bytes_recv
         ]
@@ -75,7 +84,7 @@ while True:
             adjust_process_priority(pid, predicted_time)
             
             # Log data for future learning
-            new_row = pd.DataFrame({
+            store.append({
                 'timestamp': time.time(),
                 'cpu_usage': metrics[0],
                 'memory_usage': metrics[1],
@@ -84,9 +93,7 @@ while True:
                 'network_io': metrics[4],
                 'ml_framework': framework,
                 'runtime': 0  # Will be updated when process finishes
-            }, index=[0])
-            
-            history = pd.concat([history, new_row])
-            history.to_csv('~/ai_usage_history.csv', index=False)
+            })
     
+    store.flush()
     time.sleep(60)  # Check every minute
\ No newline at end of file
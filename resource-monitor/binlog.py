@@ -0,0 +1,228 @@
+"""Fixed-record, append-only binary log for resource_monitor.
+
+File layout: one or more segments, each an 8-byte magic, a little-endian
+u4 header length and a JSON header (padded to 64 bytes) holding the NumPy
+record dtype and the device labels of the per-core/NIC/disk array fields,
+followed by back-to-back records of that dtype. When the device set
+changes the writer starts a new segment in the same file, so a reader
+finds the next header where a record would start with the magic (no
+timestamp has those bytes). Records are buffered in memory, written in
+batches and fsynced periodically; files rotate to <path>.1 ... <path>.N
+only once they reach max_bytes. Readers memory-map each segment and slice
+it by time.
+"""
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"AIOSRM01"
+ALIGN = 64
+_MAGIC_BYTES = np.frombuffer(MAGIC, dtype=np.uint8)
+
+
+def record_dtype(gpu_count=0, cores=0, nics=0, disks=0):
+    """Record layout for one monitor tick; per-device fields are fixed-size arrays."""
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("cpu_percent", "<f4"),
+        ("cpu_count", "<u4"),
+        ("memory_total", "<u8"),
+        ("memory_used", "<u8"),
+        ("memory_percent", "<f4"),
+        ("disk_percent", "<f4"),
+        ("disk_total", "<u8"),
+        ("disk_used", "<u8"),
+        ("network_sent", "<u8"),
+        ("network_recv", "<u8"),
+        ("process_count", "<u4"),
+        ("gpu_load", "<f4", (gpu_count,)),
+        ("gpu_memory_used", "<f4", (gpu_count,)),
+        ("gpu_memory_total", "<f4", (gpu_count,)),
+        ("core_percent", "<f4", (cores,)),
+        ("nic_rx_rate", "<f4", (nics,)),
+        ("nic_tx_rate", "<f4", (nics,)),
+        ("disk_read_rate", "<f4", (disks,)),
+        ("disk_write_rate", "<f4", (disks,)),
+        ("disk_read_iops", "<f4", (disks,)),
+        ("disk_write_iops", "<f4", (disks,)),
+        ("disk_busy_percent", "<f4", (disks,)),
+    ])
+
+
+def _encode_header(dtype, labels):
+    body = json.dumps({"version": 1, "dtype": dtype.descr, "labels": labels}).encode()
+    size = len(MAGIC) + 4 + len(body)
+    padded = -(-size // ALIGN) * ALIGN
+    return MAGIC + struct.pack("<I", padded) + body + b" " * (padded - size)
+
+
+def read_header(f):
+    """Return (dtype, labels, header length) of an open log file."""
+    head = f.read(len(MAGIC) + 4)
+    if len(head) < len(MAGIC) + 4 or head[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a resource_monitor binary log")
+    (length,) = struct.unpack("<I", head[len(MAGIC):])
+    meta = json.loads(f.read(length - len(head)).decode())
+    fields = [(name, fmt, tuple(shape[0])) if shape else (name, fmt)
+              for name, fmt, *shape in meta["dtype"]]
+    return np.dtype(fields), meta.get("labels", {}), length
+
+
+def file_segments(path):
+    """(dtype, labels, data offset, record count) of every segment in one log file.
+
+    A header torn by a crash ends the file; a torn trailing record is not counted.
+    """
+    size = os.path.getsize(path)
+    segments = []
+    pos = 0
+    with open(path, "rb") as f:
+        while True:
+            f.seek(pos)
+            try:
+                dtype, labels, length = read_header(f)
+            except ValueError:
+                if not segments:
+                    raise
+                break
+            offset = pos + length
+            count = max(0, (size - offset) // dtype.itemsize)
+            marks = []
+            if count:
+                raw = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(count, dtype.itemsize))
+                marks = np.flatnonzero((raw[:, :len(MAGIC)] == _MAGIC_BYTES).all(axis=1))
+            if len(marks):
+                count = int(marks[0])
+            segments.append((dtype, labels, offset, count))
+            if not len(marks):
+                break
+            pos = offset + count * dtype.itemsize
+    return segments
+
+
+class BinaryLogWriter:
+    """Buffered appender with periodic fsync and size-based rotation.
+
+    Opening a log whose last segment has another layout appends a new
+    segment rather than rotating, so device changes never cost history.
+    """
+
+    def __init__(self, path, dtype, labels=None, max_bytes=64 * 1024 * 1024, backups=5,
+                 buffer_records=64, fsync_interval=10.0):
+        self.path = path
+        self.dtype = dtype
+        self.labels = labels or {}
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fsync_interval = fsync_interval
+        self.buffer = np.zeros(buffer_records, dtype=dtype)
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.file = None
+        self._open()
+
+    def _open(self):
+        existing = None
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            try:
+                dtype, labels, offset, count = file_segments(self.path)[-1]
+            except ValueError:
+                # not a log we can append to; keep it as the newest backup
+                self._rotate()
+            else:
+                end = offset + count * dtype.itemsize
+                if os.path.getsize(self.path) > end:
+                    # drop what a crash tore so the next header lands on a record boundary
+                    os.truncate(self.path, end)
+                existing = (dtype, labels)
+        self.file = open(self.path, "ab")
+        if existing != (self.dtype, self.labels):
+            self.file.write(_encode_header(self.dtype, self.labels))
+            self.file.flush()
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def append(self, record):
+        self.buffer[self.pending] = record
+        self.pending += 1
+        if self.pending == len(self.buffer):
+            self.flush()
+        elif time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.flush(sync=True)
+
+    def flush(self, sync=None):
+        if self.pending:
+            data = self.buffer[:self.pending].tobytes()
+            if self.file.tell() + len(data) > self.max_bytes:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self._rotate()
+                self._open()
+            self.file.write(data)
+            self.pending = 0
+        if sync is None:
+            sync = time.monotonic() - self.last_sync >= self.fsync_interval
+        if sync:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.flush(sync=True)
+            self.file.close()
+            self.file = None
+
+
+def log_files(path):
+    """Existing log segments in chronological order (oldest rotation first)."""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    files = rotated[::-1]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_segments(path, start=None, end=None):
+    """Memory-map every segment of one log file; (records within [start, end], labels) per segment."""
+    segments = []
+    for dtype, labels, offset, count in file_segments(path):
+        if not count:
+            continue
+        records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        ts = records["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = count if end is None else int(np.searchsorted(ts, end, side="right"))
+        segments.append((records[lo:hi], labels))
+    return segments
+
+
+def read_range(path, start=None, end=None):
+    """Records across all rotated files of `path` within [start, end].
+
+    Returns (records, labels) pairs, oldest first, for every segment with
+    records in the window. Each segment keeps its own dtype and device
+    labels (cores, nics, disks), since devices come and go; records are
+    structured arrays, so each field (``records["cpu_percent"]``, ...) is
+    a NumPy column.
+    """
+    return [(records, labels) for p in log_files(path)
+            for records, labels in read_segments(p, start, end) if len(records)]
@@ -1,84 +1,282 @@
 #!/usr/bin/env python3
-import psutil
+import os
+import signal
+import sys
 import time
 import argparse
 from datetime import datetime
-import GPUtil
 
-def get_cpu_usage():
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.sampler import Sampler
+import binlog
+
+def get_cpu_usage(snap):
     return {
-        "usage": psutil.cpu_percent(),
-        "total": psutil.cpu_count(logical=True)
+        "usage": snap.host["cpu_percent"],
+        "total": snap.host["cpu_count"],
+        "per_core": snap.core_percent.round(1).tolist()
     }
 
-def get_memory_usage():
-    mem = psutil.virtual_memory()
+def get_memory_usage(snap):
+    mem = snap.host["memory"]
     return {
         "total": mem.total,
         "used": mem.used,
         "percent": mem.percent
     }
 
-def get_disk_usage():
-    disk = psutil.disk_usage('/')
+def get_disk_usage(snap):
+    disk = snap.host["disk"]
     return {
         "total": disk.total,
         "used": disk.used,
-        "percent": disk.percent
+        "percent": disk.percent,
+        "devices": disk_devices(snap.disks, snap.disk_rates)
     }
 
-def get_network_usage():
-    net = psutil.net_io_counters()
+def get_network_usage(snap):
+    net = snap.host["network"]
     return {
         "bytes_sent": net.bytes_sent,
-        "bytes_received": net.bytes_recv
+        "bytes_received": net.bytes_recv,
+        "interfaces": network_interfaces(snap.nics, snap.net_rates)
+    }
+
+def network_interfaces(names, rates):
+    """Per-NIC rates from an (n, 4) array of rx/tx bytes/s and rx/tx packets/s."""
+    return [
+        {"name": name, "rx_rate": row[0], "tx_rate": row[1], "rx_packets": row[2], "tx_packets": row[3]}
+        for name, row in zip(names, rates.tolist())
+    ]
+
+def disk_devices(names, rates):
+    """Per-device rates from an (n, 5) array of read/write bytes/s, read/write IOPS and busy %."""
+    return [
+        {"name": name, "read_rate": row[0], "write_rate": row[1],
+         "read_iops": row[2], "write_iops": row[3], "busy": row[4]}
+        for name, row in zip(names, rates.tolist())
+    ]
+
+def get_top_processes(snap, n=3):
+    return {
+        "count": len(snap),
+        "top": ", ".join(
+            f"{snap.name[i]} ({snap.pid[i]}) {snap.cpu_percent[i]:.1f}%" for i in snap.top(n)
+        )
     }
 
-def get_gpu_usage():
-    gpus = GPUtil.getGPUs()
+def get_gpu_stats(snap):
+    return [
+        {
+            "id": gpu.index,
+            "name": gpu.name,
+            "memoryUsed": gpu.memory_used / (1024**2),
+            "memoryTotal": gpu.memory_total / (1024**2),
+            "load": gpu.load
+        } for gpu in snap.host["gpu"]
+    ]
+
+def get_gpu_usage(gpus):
     if not gpus:
         return "No GPU detected"
     return "\n".join(
         [
-            f"{gpu.id} ({gpu.name}):\tUsed: {gpu.memoryUsed} MB / {gpu.memoryTotal} MB (Load: {gpu.load * 100:.2f}%)"
+            f"{gpu['id']} ({gpu['name']}):\tUsed: {gpu['memoryUsed']:.0f} MB / {gpu['memoryTotal']:.0f} MB (Load: {gpu['load']:.2f}%)"
             for gpu in gpus
         ]
     )
 
-def monitor_resources(interval=3, log_file=None):
-    print("Monitoring system resources... Press Ctrl+C to stop.")
-    try:
-        while True:
-            print("\033[H\033[J", end="")  # Clear screen using ANSI escape sequence
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cpu = get_cpu_usage()
-            memory = get_memory_usage()
-            disk = get_disk_usage()
-            network = get_network_usage()
-            gpu = get_gpu_usage()
-            
-            log_entry = f"""
+def format_entry(timestamp, cpu, memory, disk, network, procs, gpu):
+    top = f" (top CPU: {procs['top']})" if procs.get('top') else ""
+    cores = "  ".join(f"{i}: {usage:.1f}%" for i, usage in enumerate(cpu.get('per_core', [])))
+    nics = "".join(
+        f"\n\t{nic['name']}: rx {nic['rx_rate'] / 1024:.1f} KB/s, tx {nic['tx_rate'] / 1024:.1f} KB/s"
+        f" ({nic['rx_packets']:.0f}/{nic['tx_packets']:.0f} pkt/s)"
+        for nic in network.get('interfaces', [])
+    )
+    disks = "".join(
+        f"\n\t{dev['name']}: read {dev['read_rate'] / (1024**2):.2f} MB/s, write {dev['write_rate'] / (1024**2):.2f} MB/s"
+        f" ({dev['read_iops']:.0f}/{dev['write_iops']:.0f} IOPS, {dev['busy']:.1f}% busy)"
+        for dev in disk.get('devices', [])
+    )
+    return f"""
 Timestamp:\t{timestamp}
 CPU Usage:\t{cpu['usage']}% ({cpu['total']} cores)
+Per Core:\t{cores}
 Memory Usage:\t{memory['used'] / (1024**3):.2f} GB / {memory['total'] / (1024**3):.2f} GB ({memory['percent']}%)
 Disk Usage:\t{disk['used'] / (1024**3):.2f} GB / {disk['total'] / (1024**3):.2f} GB ({disk['percent']}%)
+Disk I/O:{disks}
 Network:\tSent={network['bytes_sent'] / (1024**2):.2f} MB\tReceived={network['bytes_received'] / (1024**2):.2f} MB
+Network Rates:{nics}
+Processes:\t{procs['count']}{top}
 GPU Usage:\n{gpu}
             """
+
+def to_record(snap, gpus):
+    host = snap.host
+    return (
+        snap.timestamp,
+        host["cpu_percent"],
+        host["cpu_count"],
+        host["memory"].total,
+        host["memory"].used,
+        host["memory"].percent,
+        host["disk"].percent,
+        host["disk"].total,
+        host["disk"].used,
+        host["network"].bytes_sent,
+        host["network"].bytes_recv,
+        len(snap),
+        [gpu["load"] for gpu in gpus],
+        [gpu["memoryUsed"] for gpu in gpus],
+        [gpu["memoryTotal"] for gpu in gpus],
+        snap.core_percent,
+        snap.net_rates[:, 0],
+        snap.net_rates[:, 1],
+        snap.disk_rates[:, 0],
+        snap.disk_rates[:, 1],
+        snap.disk_rates[:, 2],
+        snap.disk_rates[:, 3],
+        snap.disk_rates[:, 4]
+    )
+
+def log_layout(snap, gpus):
+    """Binary record dtype and device labels for the current set of devices."""
+    dtype = binlog.record_dtype(len(gpus), len(snap.cores), len(snap.nics), len(snap.disks))
+    return dtype, {"cores": snap.cores, "nics": snap.nics, "disks": snap.disks}
+
+def from_record(record, labels):
+    """Rebuild the display dictionaries of a tick from a binary log record."""
+    gpus = [
+        {
+            "id": i,
+            "name": f"GPU {i}",
+            "memoryUsed": float(record["gpu_memory_used"][i]),
+            "memoryTotal": float(record["gpu_memory_total"][i]),
+            "load": float(record["gpu_load"][i])
+        } for i in range(len(record["gpu_load"]))
+    ]
+    nic_rates = np.column_stack((record["nic_rx_rate"], record["nic_tx_rate"],
+                                 np.zeros_like(record["nic_rx_rate"]), np.zeros_like(record["nic_tx_rate"])))
+    disk_rates = np.column_stack((record["disk_read_rate"], record["disk_write_rate"], record["disk_read_iops"],
+                                  record["disk_write_iops"], record["disk_busy_percent"]))
+    return (
+        datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+        {"usage": round(float(record["cpu_percent"]), 1), "total": int(record["cpu_count"]),
+         "per_core": record["core_percent"].tolist()},
+        {"total": int(record["memory_total"]), "used": int(record["memory_used"]),
+         "percent": round(float(record["memory_percent"]), 1)},
+        {"total": int(record["disk_total"]), "used": int(record["disk_used"]),
+         "percent": round(float(record["disk_percent"]), 1),
+         "devices": disk_devices(labels.get("disks", []), disk_rates)},
+        {"bytes_sent": int(record["network_sent"]), "bytes_received": int(record["network_recv"]),
+         "interfaces": network_interfaces(labels.get("nics", []), nic_rates)},
+        {"count": int(record["process_count"])},
+        get_gpu_usage(gpus)
+    )
+
+def collect(sampler):
+    """Take one sample; returns the snapshot, GPU stats and format_entry arguments."""
+    snap = sampler.sample()
+    timestamp = datetime.fromtimestamp(snap.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    gpus = get_gpu_stats(snap)
+    entry = (
+        timestamp,
+        get_cpu_usage(snap),
+        get_memory_usage(snap),
+        get_disk_usage(snap),
+        get_network_usage(snap),
+        get_top_processes(snap),
+        get_gpu_usage(gpus)
+    )
+    return snap, gpus, entry
+
+def monitor_resources(interval=3, log_file=None, log_format="text", max_log_size=64, fsync_interval=10.0):
+    print("Monitoring system resources... Press Ctrl+C to stop.")
+    # Exit through the finally block on SIGTERM so buffered log records are written
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sampler = Sampler(gpu=True)
+    text_log = open(log_file, "a") if log_file and log_format == "text" else None
+    binary_log = None
+    try:
+        while True:
+            print("\033[H\033[J", end="")  # Clear screen using ANSI escape sequence
+            snap, gpus, entry = collect(sampler)
+            log_entry = format_entry(*entry)
             print(log_entry)
             
-            if log_file:
-                with open(log_file, "a") as f:
-                    f.write(log_entry + "\n")
+            if text_log:
+                text_log.write(log_entry + "\n")
+                text_log.flush()
+            elif log_file:
+                dtype, labels = log_layout(snap, gpus)
+                if binary_log is None or (binary_log.dtype, binary_log.labels) != (dtype, labels):
+                    if binary_log is not None:
+                        binary_log.close()
+                    binary_log = binlog.BinaryLogWriter(
+                        log_file, dtype, labels,
+                        max_bytes=int(max_log_size * 1024 * 1024), fsync_interval=fsync_interval)
+                binary_log.append(to_record(snap, gpus))
             
             time.sleep(interval)
     except KeyboardInterrupt:
         print("\nMonitoring stopped.")
+    finally:
+        if text_log:
+            text_log.close()
+        if binary_log:
+            binary_log.close()
+
+def parse_time(value):
+    """Accept epoch seconds or a "YYYY-MM-DD[ HH:MM:SS]" local timestamp."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def replay(log_file, start=None, end=None, speed=1.0):
+    """Re-render a past window of a binary log in the terminal."""
+    segments = binlog.read_range(log_file, parse_time(start), parse_time(end))
+    if not segments:
+        print("No records in the requested window.")
+        return
+    try:
+        previous = None
+        for records, labels in segments:
+            for record in records:
+                if previous is not None and speed > 0:
+                    time.sleep(max(0.0, (record["timestamp"] - previous) / speed))
+                previous = record["timestamp"]
+                print("\033[H\033[J", end="")
+                print(format_entry(*from_record(record, labels)))
+    except KeyboardInterrupt:
+        print("\nReplay stopped.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Monitor system resources.")
     parser.add_argument("--interval", "-i", type=int, default=3, help="Monitoring interval in seconds (default: 3)")
     parser.add_argument("--log", "-lf", type=str, default=None, help="Path to log file (default: None)")
+    parser.add_argument("--log-format", choices=["text", "binary"], default="text",
+                        help="Log file format; binary writes fixed-size records (default: text)")
+    parser.add_argument("--log-max-size", type=float, default=64,
+                        help="Rotate binary logs after this many MB (default: 64)")
+    parser.add_argument("--fsync-interval", type=float, default=10.0,
+                        help="Seconds between fsyncs of the binary log (default: 10)")
+    subparsers = parser.add_subparsers(dest="command")
+    replay_parser = subparsers.add_parser("replay", help="Re-render a window of a binary log")
+    replay_parser.add_argument("file", help="Path to a binary log written with --log-format binary")
+    replay_parser.add_argument("--from", dest="start", default=None, help="Start time (epoch seconds or ISO timestamp)")
+    replay_parser.add_argument("--to", dest="end", default=None, help="End time (epoch seconds or ISO timestamp)")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="Playback speed multiplier; 0 prints without pausing (default: 1)")
     args = parser.parse_args()
     
-    monitor_resources(interval=args.interval, log_file=args.log)
+    if args.command == "replay":
+        replay(args.file, args.start, args.end, args.speed)
+    else:
+        monitor_resources(interval=args.interval, log_file=args.log, log_format=args.log_format,
+                          max_log_size=args.log_max_size, fsync_interval=args.fsync_interval)
@@ -4,5 +4,5 @@
 source "$(conda info --base)/etc/profile.d/conda.sh"
 conda activate "$OSENV"
 
-python3 scheduler/bin/schedule.py
+python3 scheduler/bin/schedule.py "$@"
 conda deactivate
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Memoized burst-time predictions for the scheduler daemon.
+
+Features are quantized on a log scale (buckets about `tolerance` wide in
+relative terms), and a process is only re-scored when its quantized
+feature vector changes, its entry is older than `ttl` seconds, or it was
+evicted. Entries are keyed by (pid, start time), hold the quantized vector
+they were scored with, and are evicted least-recently-used past max_size.
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """TTL + LRU cache of predictions keyed on (pid, start time, quantized features)."""
+
+    def __init__(self, ttl=60.0, max_size=4096, tolerance=0.05):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.step = np.log1p(tolerance)
+        self.entries = OrderedDict()
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.changed = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def clear(self, model_version=None):
+        """Drop every entry, e.g. when a new model version is swapped in."""
+        self.entries.clear()
+        self.model_version = model_version
+
+    def quantize(self, X):
+        """Integer bucket of every feature; NaN gets its own bucket."""
+        X = np.asarray(X, dtype=np.float64)
+        q = np.sign(X) * np.log1p(np.abs(X)) / self.step
+        return np.where(np.isnan(q), np.iinfo(np.int64).min, np.round(np.nan_to_num(q))).astype(np.int64)
+
+    def lookup(self, keys, X, now=None):
+        """Cached predictions for `keys` (NaN where missing) and the quantized rows.
+
+        Returns (values, miss mask, quantized rows); pass the last two to store()
+        after predicting the missed rows.
+        """
+        now = time.monotonic() if now is None else now
+        quantized = self.quantize(X)
+        values = np.full(len(keys), np.nan)
+        miss = np.ones(len(keys), dtype=bool)
+        for i, (key, row) in enumerate(zip(keys, map(tuple, quantized.tolist()))):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            if entry[0] != row:
+                self.changed += 1
+            elif now - entry[2] > self.ttl:
+                self.expired += 1
+            else:
+                values[i] = entry[1]
+                miss[i] = False
+                self.entries.move_to_end(key)
+        hits = len(keys) - int(miss.sum())
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return values, miss, quantized
+
+    def store(self, keys, quantized, values, now=None):
+        now = time.monotonic() if now is None else now
+        for key, row, value in zip(keys, map(tuple, quantized.tolist()), values.tolist()):
+            self.entries[key] = (row, value, now)
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "changed": self.changed,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
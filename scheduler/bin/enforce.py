@@ -0,0 +1,218 @@
+"""Apply the predicted schedule with nice, I/O priority and CPU affinity.
+
+Processes are ranked by predicted burst time; a process' position in that
+ranking (0 = shortest) is mapped linearly onto a nice range and onto the
+best-effort I/O priority levels 0-7, and the longer `batch_fraction` of the
+ranking can be confined to a set of batch CPUs, which approximates
+shortest-predicted-job-first on a time-sharing kernel.
+
+Changes are made with direct syscalls (os.setpriority, psutil's ioprio_set,
+os.sched_setaffinity), only for processes whose target moved by at least
+`hysteresis` nice levels or changed tier, and at most once per `cooldown`
+seconds per process. Nice and I/O priority are never raised above the
+process' original, and real-time and idle I/O classes are left alone.
+Original settings are remembered and put back by restore(). Allow/deny patterns match the process name, or the cgroup v2
+path when prefixed with "cgroup:".
+"""
+import os
+import time
+from fnmatch import fnmatch
+
+import psutil
+
+
+class Enforcer:
+    """Maps predicted burst-time ranks to scheduling knobs and applies them."""
+
+    def __init__(self, nice_range=(0, 10), ionice=True, batch_cpus=None, batch_fraction=0.5,
+                 hysteresis=2, cooldown=30.0, allow=(), deny=(), dry_run=False, proc_root="/proc"):
+        self.nice_range = nice_range
+        self.ionice = ionice
+        self.batch_cpus = frozenset(batch_cpus) if batch_cpus else None
+        self.batch_fraction = batch_fraction
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.allow = list(allow)
+        self.deny = list(deny)
+        self.dry_run = dry_run
+        self.proc_root = proc_root
+        # (pid, start time) -> {"original": ..., "applied": ..., "changed_at": ...},
+        # or None for processes the allow/deny lists exclude
+        self.managed = {}
+        self.errors = 0
+
+    def _cgroup(self, pid):
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "cgroup")) as f:
+                for line in f:
+                    if line.startswith("0::"):
+                        return line[3:].strip()
+        except OSError:
+            pass
+        return ""
+
+    def _start_time(self, pid):
+        """Start time of `pid` in clock ticks, as in the sampler's start_time; None once it has exited."""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "stat"), "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        return int(stat[stat.rfind(b")") + 2:].split()[19])
+
+    def _matches(self, patterns, pid, name):
+        for pattern in patterns:
+            if pattern.startswith("cgroup:"):
+                if fnmatch(self._cgroup(pid), pattern[7:]):
+                    return True
+            elif fnmatch(name, pattern):
+                return True
+        return False
+
+    def eligible(self, pid, name, ppid=None):
+        """Skip init, kernel threads (kthreadd and its children), ourselves and anything outside allow/deny."""
+        if pid in (1, 2, os.getpid()) or ppid == 2:
+            return False
+        if self.allow and not self._matches(self.allow, pid, name):
+            return False
+        return not (self.deny and self._matches(self.deny, pid, name))
+
+    def target(self, position):
+        """Knob settings for a process at relative rank `position` (0 shortest, 1 longest)."""
+        low, high = self.nice_range
+        return {
+            "nice": low + round(position * (high - low)),
+            "ioprio": round(position * 7) if self.ionice else None,
+            "batch": self.batch_cpus is not None and position >= 1.0 - self.batch_fraction,
+        }
+
+    def _read(self, pid):
+        proc = psutil.Process(pid)
+        return {
+            "nice": os.getpriority(os.PRIO_PROCESS, pid),
+            "ioprio": tuple(proc.ionice()) if self.ionice else None,
+            "cpus": os.sched_getaffinity(pid) if self.batch_cpus is not None else None,
+        }
+
+    def _set(self, pid, nice, ioprio, cpus):
+        os.setpriority(os.PRIO_PROCESS, pid, nice)
+        if ioprio is not None:
+            ioclass, value = ioprio
+            if ioclass in (psutil.IOPRIO_CLASS_NONE, psutil.IOPRIO_CLASS_IDLE):
+                psutil.Process(pid).ionice(ioclass)
+            else:
+                psutil.Process(pid).ionice(ioclass, value)
+        if cpus is not None:
+            os.sched_setaffinity(pid, cpus)
+
+    def _ioprio(self, original, goal):
+        """Best-effort level for `goal`, never above the original I/O priority; None leaves it alone."""
+        if goal["ioprio"] is None:
+            return None
+        ioclass, value = original["ioprio"]
+        if ioclass == psutil.IOPRIO_CLASS_NONE:
+            # no explicit class: the kernel derives a best-effort level from nice
+            value = (original["nice"] + 20) // 5
+        elif ioclass != psutil.IOPRIO_CLASS_BE:
+            # real-time and idle processes keep their class
+            return None
+        return psutil.IOPRIO_CLASS_BE, max(goal["ioprio"], value)
+
+    def _due(self, state, goal, now):
+        if state["applied"] is None:
+            return True
+        applied = state["applied"]
+        moved = abs(goal["nice"] - applied["nice"]) >= self.hysteresis or goal["batch"] != applied["batch"]
+        return moved and now - state["changed_at"] >= self.cooldown
+
+    def apply(self, ranked, start, now=None):
+        """Bring every eligible ranked process to its target; returns the changes made.
+
+        `ranked` is sorted shortest predicted burst first, indexed by pid and
+        has name and ppid columns; `start` maps pid to start time so recycled
+        pids are not confused.
+        """
+        now = time.monotonic() if now is None else now
+        pids = ranked.index.tolist()
+        names = ranked["name"].tolist()
+        ppids = ranked["ppid"].tolist()
+        last = max(len(pids) - 1, 1)
+        changes = []
+        seen = set()
+        for rank, (pid, name, ppid) in enumerate(zip(pids, names, ppids)):
+            key = (pid, start[pid])
+            seen.add(key)
+            if key in self.managed and self.managed[key] is None:
+                continue
+            state = self.managed.get(key)
+            if state is None:
+                if not self.eligible(pid, name, ppid):
+                    self.managed[key] = None
+                    continue
+                try:
+                    original = self._read(pid)
+                except (psutil.Error, OSError):
+                    continue
+                state = self.managed[key] = {"original": original, "applied": None, "changed_at": 0.0}
+            goal = self.target(rank / last)
+            if not self._due(state, goal, now):
+                continue
+            original = state["original"]
+            # never raise priority above what the process started with
+            nice = max(goal["nice"], original["nice"])
+            ioprio = self._ioprio(original, goal)
+            cpus = None
+            if self.batch_cpus is not None:
+                cpus = (original["cpus"] & self.batch_cpus or original["cpus"]) if goal["batch"] else original["cpus"]
+            change = f"{pid} ({name}): nice {nice}"
+            if ioprio is not None:
+                change += f", ionice be/{ioprio[1]}"
+            if cpus is not None:
+                change += f", cpus {','.join(map(str, sorted(cpus)))}"
+            if not self.dry_run:
+                try:
+                    self._set(pid, nice, ioprio, cpus)
+                except (psutil.Error, OSError, ValueError):
+                    self.errors += 1
+                    continue
+            state["applied"] = goal
+            state["changed_at"] = now
+            changes.append(change)
+        # processes that dropped out of the ranking (usually because they exited)
+        for key in [key for key in self.managed if key not in seen]:
+            self._restore(key, self.managed.pop(key))
+        return changes
+
+    def _restore(self, key, state):
+        if state is None or state["applied"] is None or self.dry_run:
+            return
+        pid, start = key
+        if self._start_time(pid) != start:
+            # exited, and the pid may since belong to another process
+            return
+        original = state["original"]
+        try:
+            self._set(pid, original["nice"], original["ioprio"], original["cpus"])
+        except (psutil.NoSuchProcess, ProcessLookupError):
+            pass
+        except (psutil.Error, OSError, ValueError):
+            # lowering nice back needs CAP_SYS_NICE
+            self.errors += 1
+
+    def restore(self):
+        """Put back the original nice, I/O priority and affinity of every managed process."""
+        for key, state in self.managed.items():
+            self._restore(key, state)
+        self.managed.clear()
+
+
+def parse_cpus(value):
+    """CPU list in taskset/cgroup syntax, e.g. "0-3,8"."""
+    cpus = set()
+    for part in value.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
-import pickle
-import psutil
-import pandas as pd
+import argparse
+import os
+import signal
+import sys
+import time
 
-import warnings
+import numpy as np
 
-# Silence sklearn unpickle & feature‐name warnings
-warnings.filterwarnings("ignore",
-    message="Trying to unpickle estimator.*version.*",
-    category=UserWarning)
-warnings.filterwarnings("ignore",
-    message="X does not have valid feature names.*",
-    category=UserWarning)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.forest import FlatForest
+from common.metrics import TOP_N, publish
+from common.models import ModelHandle
+from common.sampler import Sampler
+from cache import PredictionCache
+from enforce import Enforcer, parse_cpus
 
 perf_metrics = [
     'CPU capacity provisioned [MHZ]', 
@@ -20,67 +22,212 @@ perf_metrics = [
     'Disk write throughput [KB/s]', 
     'CPU cores'
 ]
-with open("scheduler/bin/process-scheduler.pkl", "rb") as f:
-    state = pickle.load(f)
-    
-scaler = state["scaler"]
-model = state["model"]
-
-def get_values():
-    cpu_freq = psutil.cpu_freq()
-    cpu_capacity_mhz = cpu_freq.current if cpu_freq else None
-    cpu_cores = psutil.cpu_count(logical=True)
-    process_metrics = {}
-    initial_disk_io = {}
-    for proc in psutil.process_iter(['pid', 'name']):
-        try:
-            pid = proc.pid
-            name = proc.info['name']
-            mem_info = proc.memory_info()
-            memory_usage_kb = mem_info.rss 
-            memory_capacity_kb = mem_info.vms / 1024  
-            io_counters = proc.io_counters() if hasattr(proc, 'io_counters') else None
-            write_bytes = io_counters.write_bytes if io_counters else None
-            process_metrics[pid] = {
-                'pid': pid,
-                'name': name,
-                'Memory usage [KB]': memory_usage_kb,
-                'Memory capacity provisioned [KB]': memory_capacity_kb,
-                'CPU capacity provisioned [MHZ]': cpu_capacity_mhz,
-                'CPU cores': cpu_cores,
-                'Disk write throughput [KB/s]': 0 
-            }
-            initial_disk_io[pid] = write_bytes
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-    # time.sleep(1)
-    for proc in psutil.process_iter(['pid']):
-        pid = proc.pid
-        try:
-            io_counters = proc.io_counters() if hasattr(proc, 'io_counters') else None
-            current_write_bytes = io_counters.write_bytes if io_counters else None
-            initial_write_bytes = initial_disk_io.get(pid, None)
-            
-            if current_write_bytes is not None and initial_write_bytes is not None:
-                delta_bytes = current_write_bytes - initial_write_bytes
-                disk_write_throughput_kb_s = delta_bytes / 1024  # Convert to KB/s
-            else:
-                disk_write_throughput_kb_s = None
-            if pid in process_metrics:
-                process_metrics[pid]['Disk write throughput [KB/s]'] = disk_write_throughput_kb_s
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-    metrics_df = pd.DataFrame.from_dict(process_metrics, orient='index')
+
+def load_forest(bundle):
+    """Registry builder; rejects models trained on features this script does not compute."""
+    features = bundle.meta.get("features")
+    if features and features != perf_metrics:
+        raise ValueError(f"{bundle.name} v{bundle.version} expects features {features}")
+    return FlatForest.from_bundle(bundle)
+
+# Burst-time forest from the model registry, loaded on first prediction
+model = ModelHandle("scheduler", load_forest)
+
+def get_values(sampler=None, window=1.0):
+    """Model features of every process with an I/O delta over the last tick.
+
+    A fresh sampler is primed and given `window` seconds first, so the disk
+    write throughput is a measured rate rather than a constant 0.
+    """
+    sampler = sampler or Sampler()
+    if sampler.last is None:
+        sampler.sample()
+        time.sleep(window)
+    return features(sampler.sample())
+
+def features(snap):
+    cpu_freq = snap.host["cpu_freq"]
+    metrics_df = snap.to_frame()
+    metrics_df = metrics_df[metrics_df['write_rate'].notna() & ~metrics_df['is_new']].copy()
+    metrics_df['Memory usage [KB]'] = metrics_df['rss']
+    metrics_df['Memory capacity provisioned [KB]'] = metrics_df['vms'] / 1024
+    metrics_df['CPU capacity provisioned [MHZ]'] = cpu_freq.current if cpu_freq else None
+    metrics_df['CPU cores'] = snap.host["cpu_count"]
+    metrics_df['Disk write throughput [KB/s]'] = metrics_df['write_rate'] / 1024
     return metrics_df[
         [
             'name',
+            'ppid',
             *perf_metrics
         ]
     ]
 
-metrics = get_values()
-scaled_values = scaler.transform(metrics[perf_metrics])
-pred = model.predict(scaled_values)
-metrics["predicted burst time (ms)"] = metrics["CPU capacity provisioned [MHZ]"] / pred * 10
-metrics.sort_values(by=["predicted burst time (ms)"], inplace=True)
-print(metrics)
+def predict(metrics, cache=None, keys=None):
+    """Add the predicted burst time and sort shortest first.
+
+    With a cache, only rows whose (pid, start time) key missed or whose
+    features moved to another bucket are run through the model.
+    """
+    if metrics.empty:
+        metrics["predicted burst time (ms)"] = []
+        return metrics
+    X = metrics[perf_metrics].to_numpy(dtype=float)
+    forest = model.get()
+    if cache is None:
+        pred = forest.predict(X)
+    else:
+        if cache.model_version != model.version:
+            cache.clear(model.version)
+        pred, miss, quantized = cache.lookup(keys, X)
+        if miss.any():
+            pred[miss] = forest.predict(X[miss])
+            cache.store([key for key, m in zip(keys, miss) if m], quantized[miss], pred[miss])
+    metrics["predicted burst time (ms)"] = metrics["CPU capacity provisioned [MHZ]"] / pred * 10
+    return metrics.sort_values(by=["predicted burst time (ms)"])
+
+class ProcessTable:
+    """Per-(pid, create time) state kept across daemon ticks.
+
+    The table is columnar and aligned with the latest snapshot. The sampler
+    already matched every process against the previous tick on (pid, start
+    time), so rows are carried over for processes that are not is_new with
+    one searchsorted; new processes start empty and exited ones drop out.
+    Names, create times and every per-tick counter come straight from the
+    snapshot's arrays. update() must see every snapshot the sampler takes.
+    """
+
+    def __init__(self):
+        self.pid = np.empty(0, dtype=np.int64)
+        self.burst_ms = np.empty(0)
+
+    def update(self, snap):
+        """Align the table with `snap`."""
+        burst_ms = np.full(len(snap), np.nan)
+        known = ~snap.is_new
+        if len(self.pid) and known.any():
+            burst_ms[known] = self.burst_ms[np.searchsorted(self.pid, snap.pid[known])]
+        self.pid, self.burst_ms = snap.pid, burst_ms
+
+    def rows(self, pids):
+        """Table rows of `pids`, which must all be in the latest snapshot."""
+        return np.searchsorted(self.pid, pids)
+
+    def record(self, snap, ranked):
+        """Remember the latest prediction; annotate `ranked` with its change since last tick and process age."""
+        rows = self.rows(ranked.index.to_numpy())
+        burst_ms = ranked["predicted burst time (ms)"].to_numpy(dtype=float)
+        ranked["burst change (ms)"] = burst_ms - self.burst_ms[rows]
+        self.burst_ms[rows] = burst_ms
+        ranked["age (s)"] = snap.timestamp - snap.create_time[rows]
+        return ranked
+
+    def __len__(self):
+        return len(self.pid)
+
+def publish_predictions(df, cache=None):
+    """Share the shortest predicted bursts with the dashboard's /metrics."""
+    payload = {
+        "timestamp": time.time(),
+        "processes": [
+            {"pid": int(pid), "name": row['name'], "burst_ms": float(row["predicted burst time (ms)"])}
+            for pid, row in df.head(TOP_N).iterrows()
+        ]
+    }
+    if cache is not None:
+        payload["cache"] = cache.stats()
+    if model.version is not None:
+        payload["model"] = model.info()
+    publish("scheduler", payload)
+
+def run_daemon(interval, top, cache=None, enforcer=None):
+    """Re-rank every `interval` seconds, keeping the model and process state in memory."""
+    sampler = Sampler()
+    table = ProcessTable()
+    # systemd, docker stop and kill send SIGTERM; exit through the finally so the enforcer restores
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Ranking processes every {interval}s. Ctrl-C to stop.")
+    next_tick = time.monotonic()
+    try:
+        while True:
+            snap = sampler.sample()
+            table.update(snap)
+            metrics = features(snap)
+            pids = metrics.index.to_numpy()
+            keys = list(zip(pids.tolist(), snap.start_time[table.rows(pids)].tolist()))
+            start = dict(keys)
+            ranked = predict(metrics, cache, keys)
+            if snap.interval:
+                ranked = table.record(snap, ranked)
+                publish_predictions(ranked, cache)
+                hits = f", cache hit rate {cache.stats()['hit_rate']:.0%}" if cache is not None else ""
+                print(f"\n[{time.strftime('%H:%M:%S')}] {len(ranked)} ranked, "
+                      f"{int(snap.is_new.sum())} new, {len(table)} tracked{hits}")
+                columns = ['name', 'Disk write throughput [KB/s]', 'predicted burst time (ms)', 'burst change (ms)',
+                           'age (s)']
+                print(ranked[columns].head(top).round(2).to_string())
+                if enforcer is not None:
+                    changes = enforcer.apply(ranked, start)
+                    prefix = "would set" if enforcer.dry_run else "set"
+                    for change in changes[:top]:
+                        print(f"  {prefix} {change}")
+                    if len(changes) > top:
+                        print(f"  ... and {len(changes) - top} more")
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        if enforcer is not None:
+            enforcer.restore()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--daemon", action="store_true",
+                        help="Keep running and re-rank processes every interval")
+    parser.add_argument("-i", "--interval", type=float, default=5.0,
+                        help="Seconds between rankings (daemon mode)")
+    parser.add_argument("-n", "--top", type=int, default=10,
+                        help="Processes to show per ranking (daemon mode)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-predict every process on every ranking (daemon mode)")
+    parser.add_argument("--cache-ttl", type=float, default=60.0,
+                        help="Seconds before a cached prediction is recomputed (default: 60)")
+    parser.add_argument("--cache-size", type=int, default=4096,
+                        help="Maximum cached predictions (default: 4096)")
+    parser.add_argument("--cache-tolerance", type=float, default=0.05,
+                        help="Relative feature change that forces a re-prediction (default: 0.05)")
+    parser.add_argument("--enforce", action="store_true",
+                        help="Apply the ranking with nice/ionice/affinity (daemon mode)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="With --enforce, print the changes instead of making them")
+    parser.add_argument("--nice-range", type=int, nargs=2, default=[0, 10], metavar=("SHORTEST", "LONGEST"),
+                        help="Nice values for the shortest and longest predicted jobs (default: 0 10)")
+    parser.add_argument("--no-ionice", action="store_true", help="Leave I/O priorities alone")
+    parser.add_argument("--batch-cpus", type=parse_cpus, default=None,
+                        help="Confine the longest predicted jobs to these CPUs, e.g. 2-3")
+    parser.add_argument("--batch-fraction", type=float, default=0.5,
+                        help="Share of the ranking treated as batch jobs (default: 0.5)")
+    parser.add_argument("--hysteresis", type=int, default=2,
+                        help="Nice levels a target must move before a process is touched again (default: 2)")
+    parser.add_argument("--cooldown", type=float, default=30.0,
+                        help="Minimum seconds between changes to one process (default: 30)")
+    parser.add_argument("--allow", action="append", default=[],
+                        help="Only manage processes matching this name glob or cgroup:<path glob> (repeatable)")
+    parser.add_argument("--deny", action="append", default=[],
+                        help="Never touch processes matching this name glob or cgroup:<path glob> (repeatable)")
+    args = parser.parse_args()
+
+    if args.daemon:
+        cache = None if args.no_cache else PredictionCache(args.cache_ttl, args.cache_size, args.cache_tolerance)
+        enforcer = None
+        if args.enforce:
+            enforcer = Enforcer(tuple(args.nice_range), not args.no_ionice, args.batch_cpus, args.batch_fraction,
+                                args.hysteresis, args.cooldown, args.allow, args.deny, args.dry_run)
+        run_daemon(args.interval, args.top, cache, enforcer)
+    else:
+        metrics = predict(get_values())
+        publish_predictions(metrics)
+        print(metrics)
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,255 @@
-from sklearn.feature_selection import mutual_info_regression
+"""Train the burst-time model from the Bitbrains trace and publish it.
+
+The trace (one combined CSV, or directories of per-VM files as shipped by
+Bitbrains) is streamed in chunks into float32 columns, feature relevance is
+scored with mutual information on a random subsample, the forest is trained
+on all cores, and the result is written to the model registry as the next
+"scheduler" version (see common/models.py), which a running scheduler
+daemon picks up on its own; models trained on --select features go to
+"scheduler-select" instead, as the scheduler needs its five features.
+Parsed traces and mutual information scores are cached under --cache-dir
+(~/.cache/aios/training), keyed on the input files and parameters. Wall
+time and peak memory are reported per stage.
+
+
+    python3 scheduler/bin/training.py bitbrains.csv
+    python3 scheduler/bin/training.py fastStorage/2013-8/ --select 5
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import pickle
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.feature_selection import mutual_info_regression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-import pandas as pd
-import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.forest import SCHEMA, FlatForest
+from common.models import MODEL_DIR, save_bundle
 
 target = 'CPU usage [MHZ]'
-df = pd.read_csv("bitbrains.csv")
-features = df.columns.drop(['Timestamp [ms]', 'CPU usage [%]', target])
-X = df[features]
-y = df[target]
-print(X.shape)
-mi_scores = mutual_info_regression(X, y, random_state=42)
-mi_scores = pd.Series(mi_scores, index=features).sort_values(ascending=False)
-
-print("Mutual Information Scores:")
-print(mi_scores)
-top_features = mi_scores.index[:5].tolist()
-print("\nTop features selected:", top_features)
-
-X_selected = X[top_features]
-X_train_val, X_test, y_train_val, y_test = train_test_split(X_selected, y, test_size=0.2, random_state=42)
-X_train, X_val, y_train, y_val = train_test_split(X_train_val, y_train_val, test_size=0.25, random_state=42)
-
-print("\nDataset sizes:")
-print("Train set:", X_train.shape)
-print("Validation set:", X_val.shape)
-print("Test set:", X_test.shape)
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_val_scaled = scaler.transform(X_val)
-X_test_scaled = scaler.transform(X_test)
-print("the dataset has been scaled")
-rf = RandomForestRegressor(random_state=42, max_depth=6)
-rf.fit(X_train_scaled, y_train)
-
-# -------------------------------
-# 6. Evaluate the Model
-# -------------------------------
-# Evaluate on the training set
-y_train_pred = rf.predict(X_train_scaled)
-mae_train = mean_absolute_error(y_train, y_train_pred)
-rmse_train = np.sqrt(mean_squared_error(y_train, y_train_pred))
-r2_train = r2_score(y_train, y_train_pred)
-print("\nTraining Metrics:")
-print("MAE: {:.3f}".format(mae_train))
-print("RMSE: {:.3f}".format(rmse_train))
-print("R2 Score: {:.3f}".format(r2_train))
-# Evaluate on the validation set
-y_val_pred = rf.predict(X_val_scaled)
-mae_val = mean_absolute_error(y_val, y_val_pred)
-rmse_val = np.sqrt(mean_squared_error(y_val, y_val_pred))
-r2_val = r2_score(y_val, y_val_pred)
-
-print("\nValidation Metrics:")
-print("MAE: {:.3f}".format(mae_val))
-print("RMSE: {:.3f}".format(rmse_val))
-print("R2 Score: {:.3f}".format(r2_val))
-
-# Evaluate on the test set
-y_test_pred = rf.predict(X_test_scaled)
-mae_test = mean_absolute_error(y_test, y_test_pred)
-rmse_test = np.sqrt(mean_squared_error(y_test, y_test_pred))
-r2_test = r2_score(y_test, y_test_pred)
-
-print("\nTest Metrics:")
-print("MAE: {:.3f}".format(mae_test))
-print("RMSE: {:.3f}".format(rmse_test))
-print("R2 Score: {:.3f}".format(r2_test))
\ No newline at end of file
+# The features schedule.py computes for live processes, in its order
+scheduler_features = [
+    'CPU capacity provisioned [MHZ]',
+    'Memory capacity provisioned [KB]',
+    'Memory usage [KB]',
+    'Disk write throughput [KB/s]',
+    'CPU cores'
+]
+ignored = ['Timestamp [ms]', 'CPU usage [%]', target]
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                         "aios", "training")
+
+stages = []
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a stage and record its peak traced (Python + NumPy) memory."""
+    # restart tracing so the peak covers this stage only (reset_peak needs 3.9)
+    tracemalloc.stop()
+    tracemalloc.start()
+    start = time.perf_counter()
+    print(f"\n== {name}")
+    yield
+    _, peak = tracemalloc.get_traced_memory()
+    stages.append((name, time.perf_counter() - start, peak))
+
+
+def trace_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "**", "*.csv"), recursive=True))
+        else:
+            files.append(path)
+    if not files:
+        sys.exit("No trace files found")
+    return files
+
+
+def cache_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+def file_signature(files):
+    return [(f, os.path.getsize(f), os.path.getmtime(f)) for f in files]
+
+
+def read_trace(files, chunk_rows):
+    """Stream every file in chunks into one float32 column per trace column (timestamps float64)."""
+    columns = {}
+    rows = 0
+    for path in files:
+        with open(path) as f:
+            sep = ";" if ";" in f.readline() else ","
+        for chunk in pd.read_csv(path, sep=sep, chunksize=chunk_rows):
+            chunk.columns = [c.strip() for c in chunk.columns]
+            for name in chunk.columns:
+                # epoch milliseconds do not fit in float32
+                dtype = np.float64 if name == 'Timestamp [ms]' else np.float32
+                columns.setdefault(name, []).append(pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype))
+            rows += len(chunk)
+        print(f"  {path}: {rows} rows so far")
+    if target not in columns:
+        sys.exit(f"Trace has no {target!r} column")
+    data = {name: np.concatenate(parts) for name, parts in columns.items() if len(parts) == len(columns[target])}
+    keep = np.all([np.isfinite(values) for values in data.values()], axis=0)
+    return {name: values[keep] for name, values in data.items()}
+
+
+def load_trace(files, chunk_rows, cache_dir):
+    path = os.path.join(cache_dir, "trace-" + cache_key("v2", file_signature(files)) + ".npz") if cache_dir else None
+    if path and os.path.exists(path):
+        print(f"  cached: {path}")
+        with np.load(path) as cached:
+            return {name: cached[name] for name in cached.files}
+    data = read_trace(files, chunk_rows)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(path, **data)
+    return data
+
+
+def mutual_information(data, features, rows, seed, cache_dir, files):
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, "mi-" + cache_key(file_signature(files), features, rows, seed) + ".json")
+        if os.path.exists(path):
+            print(f"  cached: {path}")
+            with open(path) as f:
+                return pd.Series(json.load(f)).sort_values(ascending=False)
+    n = len(data[target])
+    sample = np.random.default_rng(seed).choice(n, size=min(rows, n), replace=False)
+    X = np.column_stack([data[name][sample] for name in features])
+    scores = mutual_info_regression(X, data[target][sample], random_state=seed)
+    scores = pd.Series(scores, index=features).sort_values(ascending=False)
+    if path:
+        with open(path, "w") as f:
+            json.dump(scores.to_dict(), f)
+    return scores
+
+
+def report(name, y, pred):
+    print(f"\n{name} Metrics:")
+    print("MAE: {:.3f}".format(mean_absolute_error(y, pred)))
+    print("RMSE: {:.3f}".format(np.sqrt(mean_squared_error(y, pred))))
+    print("R2 Score: {:.3f}".format(r2_score(y, pred)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the scheduler's burst-time model.")
+    parser.add_argument("trace", nargs="*", default=["bitbrains.csv"],
+                        help="Trace CSV files or directories of per-VM CSVs (default: bitbrains.csv)")
+    parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows read per chunk (default: 500000)")
+    parser.add_argument("--mi-rows", type=int, default=200000,
+                        help="Rows sampled for mutual information scoring (default: 200000)")
+    parser.add_argument("--select", type=int, default=0,
+                        help="Train on the top-N features by mutual information instead of the scheduler's five")
+    parser.add_argument("--max-rows", type=int, default=0,
+                        help="Randomly subsample the trace to this many rows before training (default: all)")
+    parser.add_argument("--trees", type=int, default=100, help="Number of trees (default: 100)")
+    parser.add_argument("--max-depth", type=int, default=6, help="Tree depth (default: 6)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Training threads (default: all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"Where parsed traces and MI scores are cached (default: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the cache")
+    parser.add_argument("--registry", default=None, help=f"Model registry directory (default: {MODEL_DIR})")
+    parser.add_argument("--name", default=None,
+                        help="Registry model name (default: scheduler, or scheduler-select with --select)")
+    parser.add_argument("--pickle", default=None, help="Also write {'model', 'scaler'} to this pickle")
+    args = parser.parse_args()
+    if args.name is None:
+        args.name = "scheduler-select" if args.select else "scheduler"
+    elif args.select and args.name == "scheduler":
+        # schedule.py, simulate.py and the fleet collector need the fixed five features
+        parser.error("--select models cannot be published as 'scheduler'; pick another --name")
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    files = trace_files(args.trace)
+
+    with stage("load trace"):
+        data = load_trace(files, args.chunk_rows, cache_dir)
+        n = len(data[target])
+        print(f"  {n} rows, {len(files)} files")
+        features = [name for name in data if name not in ignored]
+        missing = [name for name in scheduler_features if name not in data]
+        if missing and not args.select:
+            sys.exit(f"Trace lacks scheduler features: {', '.join(missing)}")
+
+    with stage("feature selection"):
+        mi_scores = mutual_information(data, features, args.mi_rows, args.seed, cache_dir, files)
+        print("Mutual Information Scores:")
+        print(mi_scores)
+        top_features = mi_scores.index[:args.select].tolist() if args.select else scheduler_features
+        print("\nTraining on:", top_features)
+        if top_features != scheduler_features:
+            print(f"  note: published as {args.name!r}; schedule.py only uses 'scheduler' models trained on",
+                  scheduler_features)
+
+    with stage("split and scale"):
+        rows = np.arange(n)
+        if args.max_rows and n > args.max_rows:
+            rows = np.sort(np.random.default_rng(args.seed).choice(n, size=args.max_rows, replace=False))
+        X = pd.DataFrame({name: data[name][rows] for name in top_features})
+        y = data[target][rows]
+        del data
+        X_train_val, X_test, y_train_val, y_test = train_test_split(X, y, test_size=0.2, random_state=args.seed)
+        X_train, X_val, y_train, y_val = train_test_split(X_train_val, y_train_val, test_size=0.25,
+                                                          random_state=args.seed)
+        print("Train set:", X_train.shape)
+        print("Validation set:", X_val.shape)
+        print("Test set:", X_test.shape)
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_val_scaled = scaler.transform(X_val)
+        X_test_scaled = scaler.transform(X_test)
+
+    with stage("train"):
+        rf = RandomForestRegressor(n_estimators=args.trees, max_depth=args.max_depth,
+                                   random_state=args.seed, n_jobs=args.jobs)
+        rf.fit(X_train_scaled, y_train)
+
+    with stage("evaluate"):
+        report("Training", y_train, rf.predict(X_train_scaled))
+        report("Validation", y_val, rf.predict(X_val_scaled))
+        report("Test", y_test, rf.predict(X_test_scaled))
+
+    with stage("publish"):
+        forest = FlatForest.from_sklearn(rf, scaler)
+        arrays, meta = forest.to_arrays()
+        meta.update(features=top_features, target=target, rows=int(len(y)),
+                    source=[os.path.basename(f) for f in files[:20]])
+        version = save_bundle(args.name, SCHEMA, arrays, meta, args.registry)
+        print(f"  wrote {args.name} v{version} to {args.registry or MODEL_DIR}")
+        if args.pickle:
+            with open(args.pickle, "wb") as f:
+                pickle.dump({"model": rf, "scaler": scaler}, f)
+            print(f"  wrote {args.pickle}")
+
+    tracemalloc.stop()
+    print(f"\n{'stage':<20}{'wall s':>9}{'peak MB':>10}")
+    for name, seconds, peak in stages:
+        print(f"{name:<20}{seconds:>9.2f}{peak / 1024 ** 2:>10.1f}")
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()